@@ -0,0 +1,53 @@
+"""reviewer keys and indexes
+
+Revision ID: 3f9c2b7d4e10
+Revises: 21a7527f1cdc
+Create Date: 2025-12-02 11:04:27.318455
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3f9c2b7d4e10'
+down_revision: Union[str, None] = '21a7527f1cdc'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # дубликаты и пустые строки не дадут создать первичный ключ
+    op.execute(
+        "DELETE FROM pr_reviewers WHERE pr_id IS NULL OR user_id IS NULL"
+    )
+    op.execute(
+        "DELETE FROM pr_reviewers a USING pr_reviewers b "
+        "WHERE a.ctid < b.ctid "
+        "AND a.pr_id = b.pr_id AND a.user_id = b.user_id"
+    )
+    op.alter_column('pr_reviewers', 'pr_id',
+               existing_type=sa.String(),
+               nullable=False)
+    op.alter_column('pr_reviewers', 'user_id',
+               existing_type=sa.String(),
+               nullable=False)
+    op.create_primary_key('pr_reviewers_pkey', 'pr_reviewers', ['pr_id', 'user_id'])
+    op.create_index('ix_pr_reviewers_user_id', 'pr_reviewers', ['user_id'], unique=False)
+    op.create_index(op.f('ix_users_team_name'), 'users', ['team_name'], unique=False)
+    op.create_index('ix_pull_requests_status_created_at', 'pull_requests', ['status', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_pull_requests_status_created_at', table_name='pull_requests')
+    op.drop_index(op.f('ix_users_team_name'), table_name='users')
+    op.drop_index('ix_pr_reviewers_user_id', table_name='pr_reviewers')
+    op.drop_constraint('pr_reviewers_pkey', 'pr_reviewers', type_='primary')
+    op.alter_column('pr_reviewers', 'user_id',
+               existing_type=sa.String(),
+               nullable=True)
+    op.alter_column('pr_reviewers', 'pr_id',
+               existing_type=sa.String(),
+               nullable=True)
@@ -0,0 +1,42 @@
+"""daily review rollups
+
+Revision ID: 45cb766836a7
+Revises: dc3114b746d4
+Create Date: 2026-10-18 16:43:24.701969
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '45cb766836a7'
+down_revision: Union[str, None] = 'dc3114b746d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('daily_team_counts',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('team_name', sa.String(), nullable=False),
+    sa.Column('opened', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('merged', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'team_name')
+    )
+    op.create_table('daily_turnaround',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('team_name', sa.String(), nullable=False),
+    sa.Column('reviewer_id', sa.String(), nullable=False),
+    sa.Column('bucket', sa.SmallInteger(), nullable=False),
+    sa.Column('merged', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('turnaround_sum', sa.Float(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day', 'team_name', 'reviewer_id', 'bucket')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('daily_turnaround')
+    op.drop_table('daily_team_counts')
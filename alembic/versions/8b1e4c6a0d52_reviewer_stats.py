@@ -0,0 +1,38 @@
+"""reviewer stats
+
+Revision ID: 8b1e4c6a0d52
+Revises: 3f9c2b7d4e10
+Create Date: 2025-12-05 15:42:10.904117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8b1e4c6a0d52'
+down_revision: Union[str, None] = '3f9c2b7d4e10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('reviewer_stats',
+    sa.Column('user_id', sa.String(), nullable=False),
+    sa.Column('open_reviews', sa.Integer(), server_default='0', nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.user_id'], ),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # счётчики для уже существующих назначений
+    op.execute(
+        "INSERT INTO reviewer_stats (user_id, open_reviews) "
+        "SELECT r.user_id, count(*) FROM pr_reviewers r "
+        "JOIN pull_requests p ON p.pull_request_id = r.pr_id "
+        "WHERE p.status = 'OPEN' GROUP BY r.user_id"
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('reviewer_stats')
@@ -0,0 +1,42 @@
+"""stats counters
+
+Revision ID: c47a19e2f8b3
+Revises: 8b1e4c6a0d52
+Create Date: 2025-12-08 10:17:53.662081
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c47a19e2f8b3'
+down_revision: Union[str, None] = '8b1e4c6a0d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pull_requests', sa.Column('reviewers_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('reviewer_stats', sa.Column('assigned_reviews', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_reviewer_stats_assigned_reviews', 'reviewer_stats', ['assigned_reviews', 'user_id'], unique=False)
+    # пересчёт по уже существующим назначениям
+    op.execute(
+        "UPDATE pull_requests p SET reviewers_count = r.n "
+        "FROM (SELECT pr_id, count(*) AS n FROM pr_reviewers "
+        "GROUP BY pr_id) r WHERE r.pr_id = p.pull_request_id"
+    )
+    op.execute(
+        "INSERT INTO reviewer_stats (user_id, assigned_reviews) "
+        "SELECT user_id, count(*) FROM pr_reviewers GROUP BY user_id "
+        "ON CONFLICT (user_id) DO UPDATE "
+        "SET assigned_reviews = excluded.assigned_reviews"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reviewer_stats_assigned_reviews', table_name='reviewer_stats')
+    op.drop_column('reviewer_stats', 'assigned_reviews')
+    op.drop_column('pull_requests', 'reviewers_count')
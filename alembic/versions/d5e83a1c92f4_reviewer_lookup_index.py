@@ -0,0 +1,29 @@
+"""reviewer lookup index
+
+Revision ID: d5e83a1c92f4
+Revises: c47a19e2f8b3
+Create Date: 2025-12-10 13:26:41.208735
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5e83a1c92f4'
+down_revision: Union[str, None] = 'c47a19e2f8b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # (user_id, pr_id) покрывает выборку PR ревьюера index-only сканом
+    op.create_index('ix_pr_reviewers_user_id_pr_id', 'pr_reviewers', ['user_id', 'pr_id'], unique=False)
+    op.drop_index('ix_pr_reviewers_user_id', table_name='pr_reviewers')
+
+
+def downgrade() -> None:
+    op.create_index('ix_pr_reviewers_user_id', 'pr_reviewers', ['user_id'], unique=False)
+    op.drop_index('ix_pr_reviewers_user_id_pr_id', table_name='pr_reviewers')
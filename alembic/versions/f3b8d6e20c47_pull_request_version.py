@@ -0,0 +1,26 @@
+"""pull request version
+
+Revision ID: f3b8d6e20c47
+Revises: e2a7c5d19b36
+Create Date: 2025-12-13 10:18:52.604213
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b8d6e20c47'
+down_revision: Union[str, None] = 'e2a7c5d19b36'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('pull_requests', sa.Column('version', sa.Integer(), server_default='0', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('pull_requests', 'version')
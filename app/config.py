@@ -0,0 +1,101 @@
+import os
+
+
+def env_int(name: str, default: int) -> int:
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+def env_float(name: str, default: float) -> float:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+
+def env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- Пул соединений и кэш подготовленных запросов ---
+DB_POOL_SIZE = env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = env_float("DB_POOL_TIMEOUT", 30.0)
+DB_POOL_RECYCLE = env_int("DB_POOL_RECYCLE", 1800)
+DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", False)
+# кэш prepared statements самого asyncpg и адаптера SQLAlchemy
+DB_STATEMENT_CACHE_SIZE = env_int("DB_STATEMENT_CACHE_SIZE", 100)
+DB_PREPARED_STATEMENT_CACHE_SIZE = env_int(
+    "DB_PREPARED_STATEMENT_CACHE_SIZE", 100
+)
+# PgBouncer в режиме transaction pooling: без кэшей и с уникальными
+# именами подготовленных запросов
+DB_PGBOUNCER = env_bool("DB_PGBOUNCER", False)
+# открыть DB_POOL_SIZE соединений и подготовить горячие запросы при старте
+DB_WARMUP = env_bool("DB_WARMUP", True)
+
+# --- Кэш составов команд ---
+ROSTER_CACHE_SIZE = env_int("ROSTER_CACHE_SIZE", 1024)
+ROSTER_CACHE_TTL = env_float("ROSTER_CACHE_TTL", 30.0)
+
+# --- Деактивация команд ---
+DEACTIVATE_CHUNK_SIZE = env_int("DEACTIVATE_CHUNK_SIZE", 500)
+
+# --- Выбор ревьюеров: least_loaded | random ---
+REVIEWER_STRATEGY = os.getenv("REVIEWER_STRATEGY", "least_loaded")
+
+# --- Метрики Prometheus на /metrics ---
+METRICS_ENABLED = env_bool("METRICS_ENABLED", True)
+
+# --- Учёт SQL на запрос: предупреждения о N+1 и превышении бюджета ---
+QUERY_AUDIT = env_bool("QUERY_AUDIT", False)
+QUERY_AUDIT_REPEAT_THRESHOLD = env_int("QUERY_AUDIT_REPEAT_THRESHOLD", 3)
+# 0 — без общего лимита, только поиск повторов
+QUERY_AUDIT_BUDGET = env_int("QUERY_AUDIT_BUDGET", 0)
+
+# --- Ответы: orjson и сборка без повторной валидации response_model ---
+FAST_JSON = env_bool("FAST_JSON", True)
+
+# --- Idempotency-Key для записи ---
+IDEMPOTENCY_ENABLED = env_bool("IDEMPOTENCY_ENABLED", True)
+IDEMPOTENCY_CACHE_SIZE = env_int("IDEMPOTENCY_CACHE_SIZE", 10000)
+IDEMPOTENCY_TTL = env_float("IDEMPOTENCY_TTL", 86400.0)
+# сколько держится ключ выполняющегося запроса: после падения процесса
+# повтор перезахватит его, не дожидаясь TTL
+IDEMPOTENCY_LEASE = env_float("IDEMPOTENCY_LEASE", 300.0)
+# хранить ключи и в таблице idempotency_keys (общие для всех процессов)
+IDEMPOTENCY_DB = env_bool("IDEMPOTENCY_DB", False)
+
+# --- Хранилище: postgres или memory (всё в памяти процесса, без БД) ---
+REPOSITORY_BACKEND = os.getenv("REPOSITORY_BACKEND", "postgres")
+
+# --- Переназначение: повторы при конфликте версий PR ---
+REASSIGN_MAX_RETRIES = env_int("REASSIGN_MAX_RETRIES", 3)
+
+# --- Фоновые задачи (таблица jobs) ---
+# воркер в процессе приложения; 0 — только отдельный python -m app.worker
+JOB_WORKER_IN_APP = env_bool("JOB_WORKER_IN_APP", True)
+JOB_POLL_INTERVAL = env_float("JOB_POLL_INTERVAL", 1.0)
+JOB_MAX_ATTEMPTS = env_int("JOB_MAX_ATTEMPTS", 3)
+# running-задача без heartbeat дольше этого считается брошенной
+JOB_STALE_AFTER = env_float("JOB_STALE_AFTER", 300.0)
+# период heartbeat выполняемой задачи, должен быть заметно меньше STALE_AFTER
+JOB_HEARTBEAT_INTERVAL = env_float("JOB_HEARTBEAT_INTERVAL", 30.0)
+# элементов импорта / bulkCreate на одну транзакцию задачи
+JOB_BATCH_SIZE = env_int("JOB_BATCH_SIZE", 500)
+
+# --- Реплика для чтения (DATABASE_REPLICA_URL) ---
+# после записи клиент читает с primary столько секунд (cookie)
+REPLICA_PIN_SECONDS = env_int("REPLICA_PIN_SECONDS", 5)
+# недоступная реплика не используется столько секунд
+REPLICA_RETRY_AFTER = env_float("REPLICA_RETRY_AFTER", 5.0)
+REPLICA_CONNECT_TIMEOUT = env_float("REPLICA_CONNECT_TIMEOUT", 2.0)
+
+# --- События назначений (GET /users/{user_id}/events) ---
+# 0 — crud не шлёт pg_notify
+EVENTS_ENABLED = env_bool("EVENTS_ENABLED", True)
+# комментарий-keepalive в простаивающем потоке, секунды
+EVENTS_KEEPALIVE = env_float("EVENTS_KEEPALIVE", 15.0)
+# непрочитанных событий на подписчика; сверх — теряются самые старые
+EVENTS_QUEUE_SIZE = env_int("EVENTS_QUEUE_SIZE", 100)
@@ -1,9 +1,148 @@
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from . import models
+import asyncio
 import random
-from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy import (
+    select,
+    insert,
+    update,
+    delete,
+    func,
+    any_,
+    bindparam,
+    exists,
+    literal,
+    text,
+    String,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
+from . import config, events, models, rebalance, rollups
+from .roster_cache import Roster, roster_cache
+from .selection import get_strategy
+from collections import Counter
+
+
+def any_of(values):
+    # = ANY($1::varchar[]) вместо IN ($1, $2, ...): текст запроса не зависит
+    # от длины списка, и подготовленный asyncpg-запрос переиспользуется
+    return any_(literal(list(values), ARRAY(String)))
+
+
+# --- Rosters ---
+def _build_roster(team_name: str, rows) -> Roster:
+    return Roster(
+        team_name=team_name,
+        members=frozenset(user_id for user_id, _ in rows),
+        active=tuple(user_id for user_id, is_active in rows if is_active),
+    )
+
+
+async def get_team_roster(db: AsyncSession, team_name: str):
+    roster = roster_cache.get(team_name)
+    if roster is not None:
+        return roster
+
+    version = roster_cache.version(team_name)
+    result = await db.execute(
+        select(models.User.user_id, models.User.is_active).where(
+            models.User.team_name == team_name
+        )
+    )
+    roster = _build_roster(team_name, result.all())
+    roster_cache.put(roster, version)
+    return roster
+
+
+async def get_team_rosters(db: AsyncSession, team_names):
+    rosters = {}
+    missing = []
+    for team_name in set(team_names):
+        roster = roster_cache.get(team_name)
+        if roster is not None:
+            rosters[team_name] = roster
+        else:
+            missing.append(team_name)
+    if not missing:
+        return rosters
+
+    versions = {t: roster_cache.version(t) for t in missing}
+    result = await db.execute(
+        select(
+            models.User.team_name, models.User.user_id, models.User.is_active
+        ).where(models.User.team_name == any_of(missing))
+    )
+    rows_by_team = {t: [] for t in missing}
+    for team_name, user_id, is_active in result.all():
+        rows_by_team[team_name].append((user_id, is_active))
+    for team_name, rows in rows_by_team.items():
+        roster = _build_roster(team_name, rows)
+        roster_cache.put(roster, versions[team_name])
+        rosters[team_name] = roster
+    return rosters
+
+
+async def get_user_team(db: AsyncSession, user_id: str):
+    team_name = roster_cache.team_of(user_id)
+    if team_name is not None:
+        return team_name
+
+    result = await db.execute(
+        select(models.User.team_name).where(models.User.user_id == user_id)
+    )
+    return result.scalar_one_or_none()
+
+
+# --- Review load ---
+async def get_open_reviews(db: AsyncSession, user_ids) -> dict:
+    user_ids = list(user_ids)
+    if not user_ids:
+        return {}
+    result = await db.execute(
+        select(
+            models.ReviewerStats.user_id, models.ReviewerStats.open_reviews
+        ).where(models.ReviewerStats.user_id == any_of(user_ids))
+    )
+    return dict(result.all())
+
+
+async def _load_for(db: AsyncSession, strategy, user_ids) -> dict:
+    if not strategy.uses_load:
+        return {}
+    return await get_open_reviews(db, user_ids)
+
+
+def _pick(strategy, candidates, k: int, load: dict):
+    picked = strategy.pick(candidates, k, load)
+    # следующие выборы в той же транзакции видят новую нагрузку
+    for user_id in picked:
+        load[user_id] = load.get(user_id, 0) + 1
+    return picked
+
+
+async def add_reviewer_stats(db: AsyncSession, deltas: Counter):
+    # назначения меняются только у открытых PR, поэтому open_reviews и
+    # assigned_reviews сдвигаются одинаково; merge уменьшает только первый
+    # сортировка по user_id — одинаковый порядок блокировок строк
+    rows = [
+        {"user_id": user_id, "open_reviews": delta, "assigned_reviews": delta}
+        for user_id, delta in sorted(deltas.items())
+        if delta
+    ]
+    if not rows:
+        return
+    stmt = pg_insert(models.ReviewerStats).values(rows)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[models.ReviewerStats.user_id],
+            set_={
+                "open_reviews": models.ReviewerStats.open_reviews
+                + stmt.excluded.open_reviews,
+                "assigned_reviews": models.ReviewerStats.assigned_reviews
+                + stmt.excluded.assigned_reviews,
+            },
+        )
+    )
 
 
 # --- Teams / Users ---
@@ -28,6 +167,62 @@ async def create_team(db: AsyncSession, team_name: str, members: list):
     return team
 
 
+# Все участники одним INSERT ... ON CONFLICT через unnest массивов: число
+# параметров не зависит от размера команды. Снимок запроса не видит строк
+# из CTE, поэтому прежние участники команды берутся из users, а новые и
+# обновлённые — из RETURNING.
+UPSERT_TEAM_MEMBERS = text(
+    """
+    WITH upserted AS (
+        INSERT INTO users (user_id, username, team_name, is_active)
+        SELECT m.user_id, m.username, :team_name, m.is_active
+        FROM unnest(
+            CAST(:user_ids AS varchar[]),
+            CAST(:usernames AS varchar[]),
+            CAST(:actives AS boolean[])
+        ) AS m(user_id, username, is_active)
+        ON CONFLICT (user_id) DO UPDATE
+        SET username = excluded.username,
+            team_name = excluded.team_name,
+            is_active = excluded.is_active
+        RETURNING user_id, username, is_active
+    )
+    SELECT user_id, username, is_active FROM users
+    WHERE team_name = :team_name
+      AND user_id <> ALL(CAST(:user_ids AS varchar[]))
+    UNION ALL
+    SELECT user_id, username, is_active FROM upserted
+    """
+)
+
+
+async def upsert_team(db: AsyncSession, team_name: str, members: list):
+    # повторы user_id в запросе: побеждает последний, как при поштучной
+    # обработке (ON CONFLICT не может обновить строку дважды)
+    by_id = {m["user_id"]: m for m in members}
+
+    await db.execute(
+        pg_insert(models.Team)
+        .values(team_name=team_name)
+        .on_conflict_do_nothing(index_elements=["team_name"])
+    )
+    result = await db.execute(
+        UPSERT_TEAM_MEMBERS,
+        {
+            "team_name": team_name,
+            "user_ids": list(by_id),
+            "usernames": [m["username"] for m in by_id.values()],
+            "actives": [m["is_active"] for m in by_id.values()],
+        },
+    )
+    rows = result.all()
+    await db.commit()
+
+    roster_cache.invalidate(team_name)
+    roster_cache.invalidate_users(by_id)
+    return rows
+
+
 async def set_user_active(db: AsyncSession, user_id: str, is_active: bool):
     user = await db.get(models.User, user_id)
     if not user:
@@ -35,107 +230,696 @@ async def set_user_active(db: AsyncSession, user_id: str, is_active: bool):
 
     user.is_active = is_active
     await db.commit()
+    roster_cache.invalidate(user.team_name)
     return user
 
 
+async def deactivate_team(
+    db: AsyncSession,
+    team_name: str,
+    chunk_size: int = config.DEACTIVATE_CHUNK_SIZE,
+    on_progress=None,
+):
+    team = await db.execute(
+        select(models.Team.team_name).where(
+            models.Team.team_name == team_name
+        )
+    )
+    if team.scalar_one_or_none() is None:
+        return None
+
+    result = await db.execute(
+        update(models.User)
+        .where(models.User.team_name == team_name)
+        .values(is_active=False)
+        .returning(models.User.user_id)
+    )
+    deactivated = list(result.scalars())
+    await db.commit()
+    roster_cache.invalidate(team_name)
+
+    affected = 0
+    reassigned = 0
+    r = models.pr_reviewers.c
+    while True:
+        # очередная пачка открытых PR, где ревьюит кто-то из команды;
+        # строки PR блокируются раньше строк ревьюеров — в том же порядке,
+        # что и в reassign, иначе они взаимно блокируются
+        batch = (
+            select(models.PullRequest.pull_request_id)
+            .where(
+                models.PullRequest.status == models.PRStatus.OPEN,
+                exists()
+                .where(
+                    r.pr_id == models.PullRequest.pull_request_id,
+                    r.user_id == models.User.user_id,
+                    models.User.team_name == team_name,
+                ),
+            )
+            .limit(chunk_size)
+            .with_for_update(of=models.PullRequest)
+        )
+        result = await db.execute(
+            delete(models.pr_reviewers)
+            .where(
+                r.user_id == models.User.user_id,
+                models.User.team_name == team_name,
+                r.pr_id.in_(batch),
+            )
+            .returning(r.pr_id, r.user_id)
+        )
+        rows = result.all()
+        if not rows:
+            break
+
+        removed = Counter(pr_id for pr_id, _ in rows)
+        events.publish(
+            db,
+            [
+                events.event_for("unassigned", user_id, pr_id, reason="deactivate")
+                for pr_id, user_id in rows
+            ],
+        )
+        deltas = Counter()
+        deltas.subtract(user_id for _, user_id in rows)
+        reassigned += await _replace_reviewers(db, removed, deltas)
+        await add_reviewer_stats(db, deltas)
+        await db.commit()
+        affected += len(removed)
+        if on_progress is not None:
+            # фоновая задача отмечает, сколько PR уже обработано
+            await on_progress(affected)
+
+    return {
+        "deactivated_users": deactivated,
+        "affected_pull_requests": affected,
+        "reassigned_pull_requests": reassigned,
+    }
+
+
+async def _replace_reviewers(
+    db: AsyncSession, removed: Counter, deltas: Counter
+) -> int:
+    author = models.User.__table__.alias("author")
+    current = func.array(
+        select(models.pr_reviewers.c.user_id)
+        .where(
+            models.pr_reviewers.c.pr_id == models.PullRequest.pull_request_id
+        )
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            models.PullRequest.pull_request_id,
+            models.PullRequest.author_id,
+            author.c.team_name,
+            current,
+        )
+        .join(author, author.c.user_id == models.PullRequest.author_id)
+        .where(models.PullRequest.pull_request_id == any_of(removed))
+    )
+    prs = result.all()
+    rosters = await get_team_rosters(
+        db, {p.team_name for p in prs if p.team_name is not None}
+    )
+
+    strategy = get_strategy()
+    load = await _load_for(
+        db, strategy, {u for r in rosters.values() for u in r.active}
+    )
+
+    rows = []
+    counts = []
+    reassigned = 0
+    for pr_id, author_id, team_name, reviewers in prs:
+        roster = rosters.get(team_name)
+        if roster is None:
+            counts.append({"b_id": pr_id, "b_count": len(reviewers)})
+            continue
+        taken = set(reviewers)
+        candidates = [
+            u for u in roster.active if u != author_id and u not in taken
+        ]
+        picked = _pick(strategy, candidates, removed[pr_id], load)
+        rows.extend({"pr_id": pr_id, "user_id": u} for u in picked)
+        deltas.update(picked)
+        counts.append({"b_id": pr_id, "b_count": len(taken) + len(picked)})
+        reassigned += bool(picked)
+
+    if rows:
+        await db.execute(insert(models.pr_reviewers).values(rows))
+        events.publish(
+            db,
+            [
+                events.event_for(
+                    "assigned", r["user_id"], r["pr_id"], reason="deactivate"
+                )
+                for r in rows
+            ],
+        )
+    if counts:
+        pr_table = models.PullRequest.__table__
+        await db.execute(
+            update(pr_table)
+            .where(pr_table.c.pull_request_id == bindparam("b_id"))
+            .values(
+                reviewers_count=bindparam("b_count"),
+                version=pr_table.c.version + 1,
+            ),
+            counts,
+        )
+    return reassigned
+
+
+async def rebalance_team(db: AsyncSession, team_name: str, dry_run: bool):
+    team = await db.execute(
+        select(models.Team.team_name).where(
+            models.Team.team_name == team_name
+        )
+    )
+    if team.scalar_one_or_none() is None:
+        return None
+
+    # состав — из БД, а не из кэша составов: его сбрасывает только свой
+    # процесс, а ревьюер обязан быть активным; FOR SHARE держит is_active
+    # до коммита
+    users = (
+        select(models.User.user_id, models.User.is_active)
+        .where(models.User.team_name == team_name)
+        .order_by(models.User.user_id)
+    )
+    if not dry_run:
+        users = users.with_for_update(read=True)
+    members = (await db.execute(users)).all()
+    r = models.pr_reviewers.c
+    stmt = select(
+        models.PullRequest.pull_request_id,
+        models.PullRequest.author_id,
+        reviewers_of(models.PullRequest.pull_request_id),
+    ).where(
+        models.PullRequest.status == models.PRStatus.OPEN,
+        exists().where(
+            r.pr_id == models.PullRequest.pull_request_id,
+            r.user_id == models.User.user_id,
+            models.User.team_name == team_name,
+        ),
+    )
+    if not dry_run:
+        # открытые PR команды блокируются до коммита: merge и reassign
+        # ждут, а reassign затем не проходит проверку версии; порядок
+        # pull_request_id — как в bulk_merge_prs, без взаимных блокировок
+        stmt = stmt.order_by(models.PullRequest.pull_request_id).with_for_update(
+            of=models.PullRequest
+        )
+    prs = (await db.execute(stmt)).all()
+    moves, before, after = rebalance.plan_moves(
+        [u for u, _ in members], [u for u, is_active in members if is_active], prs
+    )
+    result = rebalance.summary(moves, before, after)
+    if dry_run or not moves:
+        return result
+
+    # все перестановки — несколькими executemany в одной транзакции
+    await db.execute(
+        update(models.pr_reviewers)
+        .where(r.pr_id == bindparam("b_pr"), r.user_id == bindparam("b_old"))
+        .values(user_id=bindparam("b_new")),
+        [{"b_pr": p, "b_old": old, "b_new": new} for p, old, new in moves],
+    )
+    pr_table = models.PullRequest.__table__
+    await db.execute(
+        update(pr_table)
+        .where(pr_table.c.pull_request_id == bindparam("b_id"))
+        .values(version=pr_table.c.version + 1),
+        [{"b_id": pr_id} for pr_id in sorted({m[0] for m in moves})],
+    )
+    deltas = Counter()
+    for _, old, new in moves:
+        deltas[old] -= 1
+        deltas[new] += 1
+    await add_reviewer_stats(db, deltas)
+    events.publish(db, rebalance.move_events(moves))
+    await db.commit()
+    return result
+
+
 # --- Pull Requests ---
+async def pr_exists(db: AsyncSession, pr_id: str) -> bool:
+    result = await db.execute(
+        select(models.PullRequest.pull_request_id).where(
+            models.PullRequest.pull_request_id == pr_id
+        )
+    )
+    return result.scalar_one_or_none() is not None
+
+
+# колонки, из которых собирается ответ по PR
+PR_COLUMNS = (
+    models.PullRequest.pull_request_id,
+    models.PullRequest.pull_request_name,
+    models.PullRequest.author_id,
+    models.PullRequest.status,
+    models.PullRequest.created_at,
+    models.PullRequest.merged_at,
+)
+
+
+def reviewers_of(pr_id_column):
+    return func.array(
+        select(models.pr_reviewers.c.user_id)
+        .where(models.pr_reviewers.c.pr_id == pr_id_column)
+        .scalar_subquery()
+    ).label("reviewers")
+
+
+async def get_pr_row(db: AsyncSession, pr_id: str):
+    result = await db.execute(
+        select(
+            *PR_COLUMNS,
+            models.PullRequest.version,
+            reviewers_of(models.PullRequest.pull_request_id),
+        ).where(models.PullRequest.pull_request_id == pr_id)
+    )
+    return result.one_or_none()
+
+
 async def create_pr(
     db: AsyncSession, pr_id: str, pr_name: str, author_id: str
 ):
-    pr = await db.get(models.PullRequest, pr_id)
-    if pr:
-        return "exists", None
+    # команда автора и её активные участники — из кэша составов
+    team_name = await get_user_team(db, author_id)
+    if team_name is None:
+        if await pr_exists(db, pr_id):
+            return "exists", None, None
+        return "author_or_team_not_found", None, None
+    roster = await get_team_roster(db, team_name)
 
-    # загрузить автора вместе с его командой и её участниками
-    result = await db.execute(
-        select(models.User)
-        .options(
-            selectinload(models.User.team).selectinload(models.Team.members)
+    candidates = [u for u in roster.active if u != author_id]
+    strategy = get_strategy()
+    load = await _load_for(db, strategy, candidates)
+    assigned = _pick(strategy, candidates, 2, load)
+
+    # существование проверяет сам INSERT: ответ строится из RETURNING,
+    # без отдельных SELECT до и после записи
+    created = (
+        pg_insert(models.PullRequest)
+        .values(
+            pull_request_id=pr_id,
+            pull_request_name=pr_name,
+            author_id=author_id,
+            status=models.PRStatus.OPEN,
+            reviewers_count=len(assigned),
         )
-        .where(models.User.user_id == author_id)
+        .on_conflict_do_nothing(index_elements=["pull_request_id"])
+        .returning(*PR_COLUMNS)
+        .cte("created")
+    )
+    # дневной счётчик созданных PR — тем же statement
+    result = await db.execute(
+        select(created).add_cte(rollups.count_opened(created))
     )
-    author = result.scalar_one_or_none()
+    pr = result.one_or_none()
+    if pr is None:
+        await db.rollback()
+        return "exists", None, None
 
-    if not author or not author.team:
-        return "author_or_team_not_found", None
+    if assigned:
+        await db.execute(
+            insert(models.pr_reviewers).values(
+                [{"pr_id": pr_id, "user_id": u} for u in assigned]
+            )
+        )
+        await add_reviewer_stats(db, Counter(assigned))
+        events.publish(
+            db, [events.event_for("assigned", u, pr_id) for u in assigned]
+        )
 
-    candidates = [
-        u
-        for u in author.team.members
-        if u.is_active and u.user_id != author_id
-    ]
+    await db.commit()
+    return "created", pr, assigned
+
+
+async def bulk_create_prs(db: AsyncSession, items: list):
+    pr_ids = [i["pull_request_id"] for i in items if i.get("pull_request_id")]
+    author_ids = {i["author_id"] for i in items if i.get("author_id")}
 
-    assigned = (
-        random.sample(candidates, k=min(2, len(candidates)))
-        if candidates
-        else []
+    existing = set()
+    if pr_ids:
+        result = await db.execute(
+            select(models.PullRequest.pull_request_id).where(
+                models.PullRequest.pull_request_id == any_of(pr_ids)
+            )
+        )
+        existing = set(result.scalars())
+
+    # все команды авторов одним запросом, без ORM-каскадов selectin
+    author_team = {}
+    active_by_team = {}
+    rows_by_team = {}
+    if author_ids:
+        epoch = roster_cache.invalidations
+        # = ANY(ARRAY(...)) вместо IN (...): команды вычисляются один раз,
+        # и участники выбираются по индексу, а не хэш-соединением
+        author_teams = func.array(
+            select(models.User.team_name)
+            .where(models.User.user_id == any_of(author_ids))
+            .scalar_subquery()
+        )
+        result = await db.execute(
+            select(
+                models.User.user_id,
+                models.User.team_name,
+                models.User.is_active,
+            ).where(models.User.team_name == any_(author_teams))
+        )
+        for user_id, team_name, is_active in result.all():
+            author_team[user_id] = team_name
+            if is_active:
+                active_by_team.setdefault(team_name, []).append(user_id)
+            rows_by_team.setdefault(team_name, []).append((user_id, is_active))
+        # составы, загруженные заодно, кладём в кэш, если за время запроса
+        # не было ни одной инвалидации
+        if roster_cache.invalidations == epoch:
+            for team_name, rows in rows_by_team.items():
+                roster_cache.put(
+                    _build_roster(team_name, rows),
+                    roster_cache.version(team_name),
+                )
+
+    strategy = get_strategy()
+    load = await _load_for(
+        db, strategy, {u for team in active_by_team.values() for u in team}
     )
 
-    pr = models.PullRequest(
-        pull_request_id=pr_id,
-        pull_request_name=pr_name,
-        author_id=author_id,
-        status=models.PRStatus.OPEN,
-        assigned_reviewers=assigned,
+    results = []
+    pr_rows = []
+    reviewer_rows = []
+    for item in items:
+        pr_id = item.get("pull_request_id")
+        pr_name = item.get("pull_request_name")
+        author_id = item.get("author_id")
+        if not pr_id or not pr_name or not author_id:
+            results.append(("invalid", pr_id, None))
+            continue
+        if pr_id in existing:
+            results.append(("exists", pr_id, None))
+            continue
+        team_name = author_team.get(author_id)
+        if team_name is None:
+            results.append(("author_or_team_not_found", pr_id, None))
+            continue
+
+        candidates = [
+            u for u in active_by_team.get(team_name, []) if u != author_id
+        ]
+        assigned = _pick(strategy, candidates, 2, load)
+
+        existing.add(pr_id)
+        pr_rows.append(
+            {
+                "pull_request_id": pr_id,
+                "pull_request_name": pr_name,
+                "author_id": author_id,
+                "status": models.PRStatus.OPEN,
+                "reviewers_count": len(assigned),
+            }
+        )
+        reviewer_rows.extend({"pr_id": pr_id, "user_id": u} for u in assigned)
+        results.append(("created", pr_id, assigned))
+
+    if not pr_rows:
+        return results, {}
+
+    # ON CONFLICT: параллельный запрос мог успеть создать тот же PR
+    inserted = (
+        pg_insert(models.PullRequest)
+        .values(pr_rows)
+        .on_conflict_do_nothing(index_elements=["pull_request_id"])
+        .returning(*PR_COLUMNS)
+        .cte("created")
+    )
+    result = await db.execute(
+        select(inserted).add_cte(rollups.count_opened(inserted))
     )
+    created = {row.pull_request_id: row for row in result.all()}
+    reviewer_rows = [r for r in reviewer_rows if r["pr_id"] in created]
+    if reviewer_rows:
+        await db.execute(insert(models.pr_reviewers).values(reviewer_rows))
+        await add_reviewer_stats(db, Counter(r["user_id"] for r in reviewer_rows))
+        events.publish(
+            db,
+            [
+                events.event_for("assigned", r["user_id"], r["pr_id"])
+                for r in reviewer_rows
+            ],
+        )
 
-    db.add(pr)
     await db.commit()
-    return "created", pr
+    results = [
+        ("exists", pr_id, None)
+        if status == "created" and pr_id not in created
+        else (status, pr_id, assigned)
+        for status, pr_id, assigned in results
+    ]
+    return results, created
 
 
-async def merge_pr(db: AsyncSession, pr_id: str):
-    pr = await db.get(models.PullRequest, pr_id)
-    if not pr:
-        return None
+def merged_events(pr) -> list:
+    # о merge узнают ревьюеры и автор
+    return [
+        events.event_for("merged", user_id, pr.pull_request_id)
+        for user_id in dict.fromkeys([*pr.reviewers, pr.author_id])
+    ]
 
-    if pr.status == models.PRStatus.MERGED:
+
+async def merge_pr(db: AsyncSession, pr_id: str):
+    # один statement: условный UPDATE возвращает строку с ревьюерами, а
+    # счётчики уменьшает только тот, кто реально перевёл PR в MERGED
+    merged = (
+        update(models.PullRequest)
+        .where(
+            models.PullRequest.pull_request_id == pr_id,
+            models.PullRequest.status == models.PRStatus.OPEN,
+        )
+        .values(
+            status=models.PRStatus.MERGED,
+            merged_at=func.now(),
+            version=models.PullRequest.version + 1,
+        )
+        .returning(
+            *PR_COLUMNS, reviewers_of(models.PullRequest.pull_request_id)
+        )
+        .cte("merged")
+    )
+    stats = (
+        update(models.ReviewerStats)
+        .where(
+            models.ReviewerStats.user_id.in_(
+                select(func.unnest(merged.c.reviewers))
+            )
+        )
+        .values(open_reviews=models.ReviewerStats.open_reviews - 1)
+        .cte("stats")
+    )
+    result = await db.execute(
+        select(merged).add_cte(stats, *rollups.count_merged(merged))
+    )
+    pr = result.one_or_none()
+    if pr is not None:
+        events.publish(db, merged_events(pr))
+        await db.commit()
         return pr
 
-    pr.status = models.PRStatus.MERGED
-    pr.merged_at = datetime.utcnow()
-    await db.commit()
-    return pr
+    # уже смержен (или не существует): повторный merge только читает;
+    # отдельный statement видит и чужой только что закоммиченный merge
+    return await get_pr_row(db, pr_id)
 
 
-async def reassign_reviewer(db: AsyncSession, pr_id: str, old_user_id: str):
-    result = await db.execute(
-        select(models.PullRequest)
-        .options(
-            selectinload(models.PullRequest.assigned_reviewers)
-            .selectinload(models.User.team)
-            .selectinload(models.Team.members)
+async def bulk_merge_prs(db: AsyncSession, pr_ids: list):
+    """merge списка PR одним statement; для каждого id (без повторов, в
+    порядке запроса) — ("merged" | "already_merged" | "not_found", строка)."""
+    pr = models.PullRequest
+    pr_ids = list(dict.fromkeys(pr_ids))
+    # строки блокируются в порядке id: пересекающиеся bulkMerge не
+    # взаимоблокируются
+    locked = (
+        select(pr.pull_request_id)
+        .where(
+            pr.pull_request_id == any_of(pr_ids),
+            pr.status == models.PRStatus.OPEN,
         )
-        .where(models.PullRequest.pull_request_id == pr_id)
+        .order_by(pr.pull_request_id)
+        .with_for_update()
     )
-    pr = result.scalar_one_or_none()
+    merged = (
+        update(pr)
+        .where(
+            pr.pull_request_id.in_(locked),
+            pr.status == models.PRStatus.OPEN,
+        )
+        .values(
+            status=models.PRStatus.MERGED,
+            merged_at=func.now(),
+            version=pr.version + 1,
+        )
+        .returning(*PR_COLUMNS, reviewers_of(pr.pull_request_id))
+        .cte("merged")
+    )
+    # ревьюер нескольких смерженных PR теряет по открытому ревью за каждый
+    reviewer = func.unnest(merged.c.reviewers).label("user_id")
+    deltas = (
+        select(reviewer, func.count().label("n"))
+        .select_from(merged)
+        .group_by(reviewer)
+        .subquery("deltas")
+    )
+    stats = (
+        update(models.ReviewerStats)
+        .where(models.ReviewerStats.user_id == deltas.c.user_id)
+        .values(open_reviews=models.ReviewerStats.open_reviews - deltas.c.n)
+        .cte("stats")
+    )
+    result = await db.execute(
+        select(merged).add_cte(stats, *rollups.count_merged(merged))
+    )
+    rows = {row.pull_request_id: row for row in result}
+    events.publish(
+        db, [e for row in rows.values() for e in merged_events(row)]
+    )
+    await db.commit()
 
+    results = {pr_id: ("merged", row) for pr_id, row in rows.items()}
+    rest = [pr_id for pr_id in pr_ids if pr_id not in rows]
+    if rest:
+        # остальные уже смержены (в т.ч. параллельно) или не существуют
+        result = await db.execute(
+            select(*PR_COLUMNS, reviewers_of(pr.pull_request_id)).where(
+                pr.pull_request_id == any_of(rest)
+            )
+        )
+        for row in result:
+            results[row.pull_request_id] = ("already_merged", row)
+    return [
+        (pr_id, *results.get(pr_id, ("not_found", None))) for pr_id in pr_ids
+    ]
+
+
+# конфликтующие транзакции: serialization_failure, deadlock_detected и
+# unique_violation (тот же ревьюер, назначенный параллельной заменой)
+RETRYABLE_SQLSTATES = frozenset(("40001", "40P01", "23505"))
+
+
+def _is_retryable(error: DBAPIError) -> bool:
+    return getattr(error.orig, "sqlstate", None) in RETRYABLE_SQLSTATES
+
+
+async def reassign_reviewer(
+    db: AsyncSession,
+    pr_id: str,
+    old_user_id: str,
+    max_retries: int = config.REASSIGN_MAX_RETRIES,
+):
+    # оптимистично: решение принимается без блокировок, а запись проходит
+    # только если версия PR не изменилась; иначе — заново по свежим данным
+    for attempt in range(max_retries + 1):
+        if attempt:
+            await asyncio.sleep(random.uniform(0, 0.002 * 2**attempt))
+        try:
+            result = await _try_reassign(db, pr_id, old_user_id)
+        except DBAPIError as e:
+            await db.rollback()
+            if not _is_retryable(e):
+                raise
+            continue
+        if result[0] != "conflict":
+            return result
+        await db.rollback()
+    return "conflict", None, None, None
+
+
+async def _try_reassign(db: AsyncSession, pr_id: str, old_user_id: str):
+    pr = await get_pr_row(db, pr_id)
     if not pr:
-        return "pr_not_found", None, None
+        return "pr_not_found", None, None, None
 
     if pr.status == models.PRStatus.MERGED:
-        return "merged", None, None
+        return "merged", None, None, None
 
-    old_reviewer = next(
-        (u for u in pr.assigned_reviewers if u.user_id == old_user_id), None
-    )
-    if not old_reviewer:
-        return "not_assigned", None, None
+    reviewers = set(pr.reviewers)
+    if old_user_id not in reviewers:
+        return "not_assigned", None, None, None
 
-    team_members = [
+    team_name = await get_user_team(db, old_user_id)
+    roster = (
+        await get_team_roster(db, team_name) if team_name is not None else None
+    )
+    candidates = [
         u
-        for u in old_reviewer.team.members
-        if u.is_active
-        and u.user_id not in {r.user_id for r in pr.assigned_reviewers}
+        for u in (roster.active if roster else ())
+        if u not in reviewers and u != pr.author_id
     ]
 
-    if not team_members:
-        return "no_candidate", None, None
+    if not candidates:
+        return "no_candidate", None, None, None
 
-    new_reviewer = random.choice(team_members)
+    strategy = get_strategy()
+    load = await _load_for(db, strategy, candidates)
+    new_reviewer = _pick(strategy, candidates, 1, load)[0]
 
-    pr.assigned_reviewers.remove(old_reviewer)
-    pr.assigned_reviewers.append(new_reviewer)
+    # compare-and-swap версии и замена ревьюера одним statement: строка PR
+    # блокируется до коммита, замену по устаревшему составу CTE отсекает
+    pr_table = models.PullRequest.__table__
+    cas = (
+        update(pr_table)
+        .where(
+            pr_table.c.pull_request_id == pr_id,
+            pr_table.c.version == pr.version,
+        )
+        .values(version=pr_table.c.version + 1)
+        .returning(pr_table.c.pull_request_id)
+        .cte("cas")
+    )
+    result = await db.execute(
+        update(models.pr_reviewers)
+        .where(
+            models.pr_reviewers.c.pr_id == cas.c.pull_request_id,
+            models.pr_reviewers.c.user_id == old_user_id,
+        )
+        .values(user_id=new_reviewer)
+        .returning(models.pr_reviewers.c.user_id)
+    )
+    if result.scalar_one_or_none() is None:
+        return "conflict", None, None, None
+    await add_reviewer_stats(db, Counter({old_user_id: -1, new_reviewer: 1}))
+    events.publish(
+        db,
+        [
+            events.event_for(
+                "unassigned", old_user_id, pr_id, replaced_by=new_reviewer
+            ),
+            events.event_for(
+                "assigned", new_reviewer, pr_id, replaces=old_user_id
+            ),
+        ],
+    )
 
     await db.commit()
-    return "ok", pr, new_reviewer
+    assigned = [new_reviewer if u == old_user_id else u for u in pr.reviewers]
+    return "ok", pr, assigned, new_reviewer
+
+
+# --- Warm-up ---
+WARMUP_ID = "__warmup__"
+
+
+async def warm_up(db: AsyncSession):
+    # горячие запросы с заведомо несуществующими ключами: SQLAlchemy
+    # компилирует их в кэш, asyncpg готовит на этом соединении
+    await pr_exists(db, WARMUP_ID)
+    await get_pr_row(db, WARMUP_ID)
+    await get_open_reviews(db, [WARMUP_ID])
+    await get_user_team(db, WARMUP_ID)
+    # пустые составы не должны оседать в кэше
+    await get_team_rosters(db, [WARMUP_ID])
+    roster_cache.invalidate(WARMUP_ID)
+    await get_team_roster(db, WARMUP_ID)
+    roster_cache.invalidate(WARMUP_ID)
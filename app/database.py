@@ -1,19 +1,75 @@
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from uuid import uuid4
 import os
 
+from app import config, metrics
+
 DATABASE_URL = os.getenv(
     "DATABASE_URL",
     "postgresql+asyncpg://postgres:postgres@db:5432/pr_reviewer",
 )
+# реплика для GET-маршрутов; не задана — всё читается с primary
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL") or None
+
+
+def connect_args() -> dict:
+    if config.DB_PGBOUNCER:
+        return {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return {
+        "statement_cache_size": config.DB_STATEMENT_CACHE_SIZE,
+        "prepared_statement_cache_size": (
+            config.DB_PREPARED_STATEMENT_CACHE_SIZE
+        ),
+    }
+
+
+def engine_options() -> dict:
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "connect_args": connect_args(),
+        "poolclass": metrics.InstrumentedQueuePool,
+    }
+
 
-engine = create_async_engine(DATABASE_URL, echo=False)
+engine = create_async_engine(DATABASE_URL, echo=False, **engine_options())
+metrics.register_engine(engine, "primary")
 AsyncSessionLocal = sessionmaker(
     engine, class_=AsyncSession, expire_on_commit=False
 )
+
+replica_engine = None
+ReplicaSessionLocal = None
+if DATABASE_REPLICA_URL:
+    replica_options = engine_options()
+    # недоступная реплика не должна держать запрос до таймаута asyncpg
+    replica_options["connect_args"]["timeout"] = config.REPLICA_CONNECT_TIMEOUT
+    replica_engine = create_async_engine(
+        DATABASE_REPLICA_URL, echo=False, **replica_options
+    )
+    metrics.register_engine(replica_engine, "replica")
+    ReplicaSessionLocal = sessionmaker(
+        replica_engine, class_=AsyncSession, expire_on_commit=False
+    )
 Base = declarative_base()
 
 
+def get_session_factory():
+    return AsyncSessionLocal
+
+
 async def get_db():
     async with AsyncSessionLocal() as session:
         yield session
+
+
+def get_replica_session_factory():
+    return ReplicaSessionLocal
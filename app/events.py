@@ -0,0 +1,169 @@
+"""События назначений для GET /users/{user_id}/events (SSE).
+
+Запись в crud кладёт события в сессию (publish), а перед коммитом они
+уходят одним pg_notify — только если транзакция действительно
+коммитится. Каждый процесс держит одно LISTEN-соединение (Broker) и
+раздаёт уведомления очередям подписчиков своего процесса; соединения
+клиентов к БД не ходят, поэтому тысячи простаивающих потоков — это
+тысячи asyncio-очередей.
+"""
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Optional
+
+import asyncpg
+import orjson
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from app import config, metrics
+from app.database import DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "review_events"
+PENDING = "pending_events"
+NOTIFY = text(
+    "SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS text[])) p"
+)
+
+
+def publish(db, events):
+    """Отложить события до коммита сессии db (AsyncSession)."""
+    if config.EVENTS_ENABLED and events:
+        db.sync_session.info.setdefault(PENDING, []).extend(events)
+
+
+def event_for(kind: str, user_id: str, pr_id: str, **extra) -> dict:
+    return {"type": kind, "user_id": user_id, "pull_request_id": pr_id, **extra}
+
+
+@event.listens_for(Session, "before_commit")
+def _send_pending(session):
+    pending = session.info.pop(PENDING, None)
+    if pending:
+        # NOTIFY транзакционен: подписчики получат события после коммита
+        session.execute(
+            NOTIFY,
+            {
+                "channel": CHANNEL,
+                "payloads": [orjson.dumps(e).decode() for e in pending],
+            },
+        )
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending(session, previous_transaction):
+    session.info.pop(PENDING, None)
+
+
+class Broker:
+    """Одно LISTEN-соединение на процесс и очереди подписчиков по user_id.
+
+    Без database_url (хранилище в памяти) события приходят только через
+    dispatch из того же процесса.
+    """
+
+    def __init__(self, database_url: Optional[str], queue_size: int = None):
+        # asyncpg не понимает диалект SQLAlchemy в схеме URL
+        self.dsn = database_url and database_url.replace("+asyncpg", "")
+        self.queue_size = queue_size or config.EVENTS_QUEUE_SIZE
+        self.subscribers = defaultdict(set)
+        self._connection = None
+        self._lock = asyncio.Lock()
+        self._reconnect = None
+
+    async def _connect(self):
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(CHANNEL, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        self._connection = connection
+
+    async def start(self):
+        if self.dsn is None:
+            return
+        async with self._lock:
+            if self._connection is None or self._connection.is_closed():
+                await self._connect()
+
+    async def close(self):
+        if self._reconnect is not None:
+            self._reconnect.cancel()
+        if self._connection is not None and not self._connection.is_closed():
+            await self._connection.close()
+        self._connection = None
+
+    def _on_terminate(self, connection):
+        if self._connection is connection and self.subscribers:
+            logger.warning("event listener connection lost, reconnecting")
+            self._reconnect = asyncio.create_task(self._reconnect_loop())
+
+    async def _reconnect_loop(self):
+        delay = 0.5
+        while self.subscribers:
+            try:
+                await self.start()
+                return
+            except (OSError, asyncpg.PostgresError):
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30)
+
+    def _on_notify(self, connection, pid, channel, payload):
+        try:
+            data = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            return
+        self.dispatch(data)
+
+    def dispatch(self, data: dict):
+        for queue in self.subscribers.get(data.get("user_id"), ()):
+            if queue.full():
+                # медленный клиент теряет самое старое событие, а не
+                # задерживает остальных
+                queue.get_nowait()
+            queue.put_nowait(data)
+
+    async def subscribe(self, user_id: str) -> asyncio.Queue:
+        await self.start()
+        queue = asyncio.Queue(self.queue_size)
+        self.subscribers[user_id].add(queue)
+        metrics.EVENT_SUBSCRIBERS.labels().inc()
+        return queue
+
+    def unsubscribe(self, user_id: str, queue: asyncio.Queue):
+        queues = self.subscribers.get(user_id)
+        if queues is not None and queue in queues:
+            queues.discard(queue)
+            metrics.EVENT_SUBSCRIBERS.labels().dec()
+            if not queues:
+                del self.subscribers[user_id]
+
+
+broker = Broker(
+    None if config.REPOSITORY_BACKEND == "memory" else DATABASE_URL
+)
+
+
+def get_event_broker() -> Broker:
+    return broker
+
+
+async def event_stream(broker: Broker, user_id: str, keepalive: float = None):
+    """Кадры SSE: событие на кадр, комментарий-keepalive при простое."""
+    keepalive = keepalive or config.EVENTS_KEEPALIVE
+    queue = await broker.subscribe(user_id)
+    try:
+        yield b"retry: 3000\n: connected\n\n"
+        while True:
+            try:
+                data = await asyncio.wait_for(queue.get(), keepalive)
+            except asyncio.TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+            yield b"event: %s\ndata: %s\n\n" % (
+                data["type"].encode(),
+                orjson.dumps(data),
+            )
+    finally:
+        broker.unsubscribe(user_id, queue)
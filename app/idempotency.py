@@ -0,0 +1,367 @@
+"""Идемпотентность записи по заголовку Idempotency-Key.
+
+Повтор запроса с тем же ключом получает сохранённый ответ, не доходя до
+логики назначения. Одновременные дубли в процессе ждут одно выполнение.
+Ответы хранятся в LRU процесса с TTL; при IDEMPOTENCY_DB=1 — ещё и в
+таблице idempotency_keys, что видят все экземпляры сервиса.
+"""
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from starlette.routing import Match
+
+from app import config, models
+from app.database import get_session_factory
+from app.responses import dumps
+
+HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+IDEMPOTENT_PATHS = frozenset(
+    (
+        "/pullRequest/create",
+        "/pullRequest/bulkCreate",
+        "/pullRequest/merge",
+        "/pullRequest/bulkMerge",
+        "/pullRequest/reassign",
+    )
+)
+
+
+@dataclass(frozen=True)
+class StoredResponse:
+    fingerprint: str
+    status_code: int
+    content_type: Optional[str]
+    body: bytes
+
+
+class MemoryStore:
+    """LRU на max_entries ключей; запись живёт ttl секунд."""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+
+    def get(self, key) -> Optional[StoredResponse]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, response = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return response
+
+    def put(self, key, response: StoredResponse):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DatabaseStore:
+    """Ключи в таблице idempotency_keys. Строка без status_code — запрос
+    выполняется в другом процессе и держит ключ lease секунд; сохранённый
+    ответ живёт ttl. Истёкшие строки перезахватываются."""
+
+    def __init__(self, ttl: float, lease: float, purge_every: int = 1000):
+        self.ttl = ttl
+        self.lease = lease
+        self.purge_every = purge_every
+        self._reservations = 0
+
+    async def reserve(self, session_factory, endpoint, key, fingerprint):
+        """True — ключ наш; иначе сохранённый ответ или None, если
+        запрос с этим ключом ещё выполняется."""
+        table = models.IdempotencyKey
+        now = datetime.now(timezone.utc)
+        stmt = pg_insert(table).values(
+            endpoint=endpoint,
+            key=key,
+            fingerprint=fingerprint,
+            expires_at=now + timedelta(seconds=self.lease),
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.endpoint, table.key],
+            set_={
+                "fingerprint": stmt.excluded.fingerprint,
+                "status_code": None,
+                "content_type": None,
+                "body": None,
+                "created_at": stmt.excluded.created_at,
+                "expires_at": stmt.excluded.expires_at,
+            },
+            where=table.expires_at <= now,
+        ).returning(table.key)
+        async with session_factory() as session:
+            reserved = (await session.execute(stmt)).scalar_one_or_none()
+            await session.commit()
+            if reserved is not None:
+                self._reservations += 1
+                if self._reservations % self.purge_every == 0:
+                    await self.purge_expired(session_factory)
+                return True
+            row = (
+                await session.execute(
+                    select(
+                        table.fingerprint,
+                        table.status_code,
+                        table.content_type,
+                        table.body,
+                    ).where(table.endpoint == endpoint, table.key == key)
+                )
+            ).one_or_none()
+        if row is None or row.status_code is None:
+            return None
+        return StoredResponse(
+            row.fingerprint, row.status_code, row.content_type, row.body
+        )
+
+    async def complete(self, session_factory, endpoint, key, response):
+        table = models.IdempotencyKey
+        async with session_factory() as session:
+            await session.execute(
+                update(table)
+                .where(table.endpoint == endpoint, table.key == key)
+                .values(
+                    status_code=response.status_code,
+                    content_type=response.content_type,
+                    body=response.body,
+                    expires_at=datetime.now(timezone.utc)
+                    + timedelta(seconds=self.ttl),
+                )
+            )
+            await session.commit()
+
+    async def release(self, session_factory, endpoint, key):
+        # ответ не сохраняем (5xx): повтор клиента выполнится заново
+        table = models.IdempotencyKey
+        async with session_factory() as session:
+            await session.execute(
+                delete(table).where(
+                    table.endpoint == endpoint,
+                    table.key == key,
+                    table.status_code.is_(None),
+                )
+            )
+            await session.commit()
+
+    async def purge_expired(self, session_factory) -> int:
+        table = models.IdempotencyKey
+        async with session_factory() as session:
+            result = await session.execute(
+                delete(table).where(
+                    table.expires_at <= datetime.now(timezone.utc)
+                )
+            )
+            await session.commit()
+        return result.rowcount
+
+
+memory_store = MemoryStore(
+    config.IDEMPOTENCY_CACHE_SIZE, config.IDEMPOTENCY_TTL
+)
+database_store = DatabaseStore(
+    config.IDEMPOTENCY_TTL, config.IDEMPOTENCY_LEASE
+)
+# ключ -> Future с ответом выполняющегося запроса
+_in_flight = {}
+
+
+async def _send_response(send, response: StoredResponse, replayed: bool):
+    headers = [(b"content-length", str(len(response.body)).encode())]
+    if response.content_type:
+        headers.append((b"content-type", response.content_type.encode()))
+    if replayed:
+        headers.append((b"idempotent-replayed", b"true"))
+    await send(
+        {
+            "type": "http.response.start",
+            "status": response.status_code,
+            "headers": headers,
+        }
+    )
+    await send({"type": "http.response.body", "body": response.body})
+
+
+async def _send_error(send, status_code: int, code: str, message: str):
+    body = dumps({"detail": {"error": {"code": code, "message": message}}})
+    await _send_response(
+        send,
+        StoredResponse("", status_code, "application/json", body),
+        replayed=False,
+    )
+
+
+def _resolve_route(scope):
+    # повтор не доходит до роутера; маршрут нужен метрикам для метки
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            scope["route"] = route
+            return
+
+
+class IdempotencyMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "POST"
+            or scope["path"] not in IDEMPOTENT_PATHS
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = dict(scope["headers"]).get(HEADER)
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await _send_error(
+                send, 400, "BAD_REQUEST", "Idempotency-Key must be 1-255 chars"
+            )
+            return
+
+        # тело читаем целиком: по нему отличаем повтор от повторного
+        # использования ключа с другим запросом
+        chunks = []
+        while True:
+            message = await receive()
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        # query входит в отпечаток: ?async=true с тем же телом — другой запрос
+        fingerprint = hashlib.sha256(
+            scope.get("query_string", b"") + b"\n" + body
+        ).hexdigest()
+        endpoint = f"{scope['method']} {scope['path']}"
+        cache_key = (endpoint, key.decode("latin-1"))
+
+        stored = memory_store.get(cache_key)
+        while stored is None and cache_key in _in_flight:
+            # дубль ждёт выполняющийся запрос; None — тот упал, и
+            # выполнять придётся самому
+            stored = await asyncio.shield(_in_flight[cache_key])
+        if stored is not None:
+            _resolve_route(scope)
+            await self._replay(send, stored, fingerprint)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        _in_flight[cache_key] = future
+        stored = None
+        try:
+            stored = await self._execute(
+                scope, body, send, fingerprint, endpoint, cache_key
+            )
+        finally:
+            del _in_flight[cache_key]
+            future.set_result(stored)
+
+    async def _replay(self, send, stored: StoredResponse, fingerprint: str):
+        if stored.fingerprint != fingerprint:
+            await _send_error(
+                send,
+                422,
+                "IDEMPOTENCY_KEY_REUSED",
+                "Idempotency-Key was used with a different request",
+            )
+            return
+        await _send_response(send, stored, replayed=True)
+
+    async def _execute(
+        self, scope, body, send, fingerprint, endpoint, cache_key
+    ) -> Optional[StoredResponse]:
+        """Ответ для ждущих дублей; None — повторять нечего (5xx, 409)."""
+        session_factory = None
+        if config.IDEMPOTENCY_DB:
+            app = scope["app"]
+            session_factory = app.dependency_overrides.get(
+                get_session_factory, get_session_factory
+            )()
+            reserved = await database_store.reserve(
+                session_factory, endpoint, cache_key[1], fingerprint
+            )
+            if reserved is None:
+                await _send_error(
+                    send,
+                    409,
+                    "IDEMPOTENCY_IN_PROGRESS",
+                    "request with this Idempotency-Key is in progress",
+                )
+                return None
+            if reserved is not True:
+                memory_store.put(cache_key, reserved)
+                await self._replay(send, reserved, fingerprint)
+                return reserved
+
+        delivered = False
+
+        async def receive():
+            nonlocal delivered
+            if delivered:
+                return {"type": "http.disconnect"}
+            delivered = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        start = {}
+        parts = []
+
+        async def capture(message):
+            if message["type"] == "http.response.start":
+                start.update(message)
+            elif message["type"] == "http.response.body":
+                parts.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, capture)
+        except BaseException:
+            if session_factory is not None:
+                await database_store.release(
+                    session_factory, endpoint, cache_key[1]
+                )
+            raise
+
+        headers = dict(start.get("headers", ()))
+        content_type = headers.get(b"content-type")
+        stored = StoredResponse(
+            fingerprint,
+            start["status"],
+            content_type.decode("latin-1") if content_type else None,
+            b"".join(parts),
+        )
+        if stored.status_code >= 500:
+            if session_factory is not None:
+                await database_store.release(
+                    session_factory, endpoint, cache_key[1]
+                )
+            # ждущие дубли выполнят запрос сами, а не получат эту ошибку
+            return None
+
+        memory_store.put(cache_key, stored)
+        if session_factory is not None:
+            await database_store.complete(
+                session_factory, endpoint, cache_key[1], stored
+            )
+        return stored
@@ -0,0 +1,161 @@
+"""Очередь фоновых задач в таблице jobs.
+
+Запрос кладёт задачу и сразу отвечает 202 с её id; воркер (app.worker)
+забирает задачи через FOR UPDATE SKIP LOCKED, поэтому несколько воркеров
+не мешают друг другу и не берут одну задачу дважды.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import uuid4
+
+from sqlalchemy import and_, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import config, models
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+LOST_ERROR = "worker lost: no heartbeat, attempts exhausted"
+
+
+class PermanentJobError(Exception):
+    """Повтор не поможет (нет команды и т.п.): задача сразу failed."""
+
+
+async def enqueue(
+    db: AsyncSession, kind: str, payload: dict, total: Optional[int] = None
+) -> str:
+    job_id = uuid4().hex
+    db.add(
+        models.Job(
+            job_id=job_id,
+            kind=kind,
+            payload=payload,
+            status=QUEUED,
+            progress_total=total,
+        )
+    )
+    await db.commit()
+    return job_id
+
+
+async def get_job(db: AsyncSession, job_id: str) -> Optional[models.Job]:
+    return await db.get(models.Job, job_id)
+
+
+async def claim(session_factory, stale_after: float = None):
+    """Забирает самую старую доступную задачу: queued или running, чей
+    воркер перестал слать heartbeat. None — очередь пуста.
+
+    Брошенная задача, у которой попытки уже кончились, не забирается, а
+    помечается failed. Номер попытки в возвращённой строке — токен
+    владения: set_progress/succeed/fail с чужой попыткой ничего не меняют.
+    """
+    stale_after = stale_after or config.JOB_STALE_AFTER
+    max_attempts = config.JOB_MAX_ATTEMPTS
+    job = models.Job
+    stale = datetime.now(timezone.utc) - timedelta(seconds=stale_after)
+    candidate = (
+        select(job.job_id)
+        .where(
+            or_(
+                job.status == QUEUED,
+                and_(
+                    job.status == RUNNING,
+                    job.heartbeat_at < stale,
+                    job.attempts < max_attempts,
+                ),
+            )
+        )
+        .order_by(job.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    async with session_factory() as session:
+        await session.execute(
+            update(job)
+            .where(
+                job.status == RUNNING,
+                job.heartbeat_at < stale,
+                job.attempts >= max_attempts,
+            )
+            .values(
+                status=FAILED,
+                error=LOST_ERROR,
+                finished_at=func.now(),
+            )
+        )
+        result = await session.execute(
+            update(job)
+            .where(job.job_id == candidate)
+            .values(
+                status=RUNNING,
+                attempts=job.attempts + 1,
+                started_at=func.now(),
+                heartbeat_at=func.now(),
+                error=None,
+            )
+            .returning(job.job_id, job.kind, job.payload, job.attempts)
+        )
+        row = result.one_or_none()
+        await session.commit()
+    return row
+
+
+async def _update(session_factory, job, **values) -> bool:
+    """Обновляет задачу, только пока она за этой попыткой; False — задачу
+    уже забрал другой воркер или она завершена."""
+    async with session_factory() as session:
+        result = await session.execute(
+            update(models.Job)
+            .where(
+                models.Job.job_id == job.job_id,
+                models.Job.attempts == job.attempts,
+                models.Job.status == RUNNING,
+            )
+            .values(heartbeat_at=func.now(), **values)
+        )
+        await session.commit()
+    return result.rowcount > 0
+
+
+async def heartbeat(session_factory, job) -> bool:
+    return await _update(session_factory, job)
+
+
+async def set_progress(
+    session_factory, job, done: int, total: Optional[int] = None
+):
+    values = {"progress_done": done}
+    if total is not None:
+        values["progress_total"] = total
+    await _update(session_factory, job, **values)
+
+
+async def succeed(session_factory, job, result):
+    await _update(
+        session_factory,
+        job,
+        status=SUCCEEDED,
+        result=result,
+        finished_at=func.now(),
+    )
+
+
+async def fail(session_factory, job, error: str, retry: bool):
+    # задачи написаны так, что повтор безопасен: upsert, повторная
+    # деактивация и PR_EXISTS для уже созданных PR
+    if retry:
+        await _update(session_factory, job, status=QUEUED, error=error)
+        return
+    await _update(
+        session_factory,
+        job,
+        status=FAILED,
+        error=error,
+        finished_at=func.now(),
+    )
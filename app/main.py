@@ -1,10 +1,85 @@
-from fastapi import FastAPI
-from app.routers import teams, users, pull_requests, stats
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 
-app = FastAPI(title="PR Reviewer Assignment Service")
+from fastapi import FastAPI, Request
+from app import config, events, idempotency, metrics, query_audit, replica, warmup
+from app.repository import BackendNotSupported, memory_backend
+from app.responses import DefaultResponse
+from app.database import engine, get_session_factory, replica_engine
+from app.routers import teams, users, pull_requests, stats, jobs, export
+from app.worker import Worker
+
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if config.METRICS_ENABLED:
+        metrics.enable()
+    # хранилище в памяти: ни прогрева пула, ни очереди задач
+    database = not memory_backend()
+    if config.DB_WARMUP and database:
+        try:
+            await warmup.warm_up()
+            if replica_engine is not None:
+                await warmup.warm_up(replica_engine)
+        except Exception:
+            # холодный старт лучше, чем не стартовать вовсе
+            logger.exception("database warm-up failed")
+
+    stop = asyncio.Event()
+    worker_task = None
+    if config.JOB_WORKER_IN_APP and database:
+        session_factory = app.dependency_overrides.get(
+            get_session_factory, get_session_factory
+        )()
+        worker_task = asyncio.create_task(Worker(session_factory).run(stop))
+    yield
+    stop.set()
+    if worker_task is not None:
+        # текущая задача доделывается; брошенную заберут по heartbeat
+        await worker_task
+    await events.broker.close()
+    await engine.dispose()
+    if replica_engine is not None:
+        await replica_engine.dispose()
+
+
+app = FastAPI(
+    title="PR Reviewer Assignment Service",
+    lifespan=lifespan,
+    default_response_class=DefaultResponse,
+)
+# последний добавленный middleware — внешний: метрики видят и повторы
+if replica_engine is not None and config.REPLICA_PIN_SECONDS:
+    app.add_middleware(replica.ReadYourWritesMiddleware)
+if config.IDEMPOTENCY_ENABLED:
+    app.add_middleware(idempotency.IdempotencyMiddleware)
+if config.METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+if config.QUERY_AUDIT:
+    app.add_middleware(query_audit.QueryAuditMiddleware)
+
+
+@app.exception_handler(BackendNotSupported)
+async def backend_not_supported(request: Request, exc: BackendNotSupported):
+    return DefaultResponse(
+        status_code=501,
+        content={
+            "detail": {
+                "error": {
+                    "code": "NOT_SUPPORTED",
+                    "message": f"{exc} requires REPOSITORY_BACKEND=postgres",
+                }
+            }
+        },
+    )
 
 
 app.include_router(stats.router)
 app.include_router(teams.router, prefix="/team")
 app.include_router(users.router, prefix="/users")
 app.include_router(pull_requests.router, prefix="/pullRequest")
+app.include_router(jobs.router, prefix="/jobs")
+app.include_router(export.router, prefix="/export")
@@ -0,0 +1,390 @@
+"""Хранилище в памяти процесса (REPOSITORY_BACKEND=memory).
+
+Словари и множества вместо таблиц: у команды — участники и индекс активных,
+у пользователя — множество PR, где он ревьюер, счётчики назначений — как
+reviewer_stats. Между чтением и записью методы не уступают управление
+event loop, поэтому каждый вызов атомарен, как транзакция. Данные живут до
+перезапуска процесса и у каждого процесса свои.
+"""
+import dataclasses
+import heapq
+from collections import Counter, defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from app import config, events, models, rebalance
+from app.repository import Repository
+from app.selection import get_strategy
+
+
+@dataclass
+class MemoryUser:
+    user_id: str
+    username: str
+    team_name: str
+    is_active: bool
+
+
+@dataclass
+class MemoryPR:
+    pull_request_id: str
+    pull_request_name: str
+    author_id: str
+    status: models.PRStatus
+    created_at: datetime
+    merged_at: Optional[datetime] = None
+    reviewers: List[str] = field(default_factory=list)
+    version: int = 1
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _copy(row):
+    # наружу — копии: ответ не меняется от следующих записей
+    if isinstance(row, MemoryPR):
+        return dataclasses.replace(row, reviewers=list(row.reviewers))
+    return dataclasses.replace(row)
+
+
+def _publish(items):
+    if config.EVENTS_ENABLED:
+        for event in items:
+            events.broker.dispatch(event)
+
+
+class MemoryRepository(Repository):
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.users = {}
+        # участники команды в порядке добавления и индекс активных
+        self.teams = {}
+        self.active = {}
+        self.prs = {}
+        self.reviews = defaultdict(set)
+        self.open_reviews = Counter()
+        self.assigned_reviews = Counter()
+
+    # --- назначения ---
+    def _pick(self, strategy, candidates, k: int):
+        # open_reviews растёт сразу при назначении, поэтому следующий
+        # выбор в том же вызове видит новую нагрузку
+        load = self.open_reviews if strategy.uses_load else None
+        return strategy.pick(candidates, k, load)
+
+    def _assign(self, pr: MemoryPR, user_ids, **extra):
+        for user_id in user_ids:
+            pr.reviewers.append(user_id)
+            self.reviews[user_id].add(pr.pull_request_id)
+            self.open_reviews[user_id] += 1
+            self.assigned_reviews[user_id] += 1
+        _publish(
+            events.event_for("assigned", u, pr.pull_request_id, **extra)
+            for u in user_ids
+        )
+
+    def _unassign(self, pr: MemoryPR, user_id: str, **extra):
+        pr.reviewers.remove(user_id)
+        self.reviews[user_id].discard(pr.pull_request_id)
+        self.open_reviews[user_id] -= 1
+        self.assigned_reviews[user_id] -= 1
+        _publish(
+            [events.event_for("unassigned", user_id, pr.pull_request_id, **extra)]
+        )
+
+    def _merge(self, pr: MemoryPR, now: datetime):
+        pr.status = models.PRStatus.MERGED
+        pr.merged_at = now
+        pr.version += 1
+        self.open_reviews.subtract(pr.reviewers)
+        _publish(
+            events.event_for("merged", u, pr.pull_request_id)
+            for u in dict.fromkeys([*pr.reviewers, pr.author_id])
+        )
+
+    # --- команды и пользователи ---
+    async def upsert_team(self, team_name: str, members: list):
+        by_id = {m["user_id"]: m for m in members}
+        team = self.teams.setdefault(team_name, {})
+        active = self.active.setdefault(team_name, set())
+        previous = [u for u in team if u not in by_id]
+        for user_id, m in by_id.items():
+            user = self.users.get(user_id)
+            if user is None:
+                user = self.users[user_id] = MemoryUser(
+                    user_id, m["username"], team_name, m["is_active"]
+                )
+            elif user.team_name != team_name:
+                # переход из другой команды
+                self.teams[user.team_name].pop(user_id, None)
+                self.active[user.team_name].discard(user_id)
+            user.username = m["username"]
+            user.team_name = team_name
+            user.is_active = m["is_active"]
+            team[user_id] = None
+            if user.is_active:
+                active.add(user_id)
+            else:
+                active.discard(user_id)
+        return [_copy(self.users[u]) for u in previous + list(by_id)]
+
+    async def get_team(self, team_name: str):
+        team = self.teams.get(team_name)
+        if team is None:
+            return None
+        return [_copy(self.users[u]) for u in team]
+
+    async def team_exists(self, team_name: str) -> bool:
+        return team_name in self.teams
+
+    async def set_user_active(self, user_id: str, is_active: bool):
+        user = self.users.get(user_id)
+        if user is None:
+            return None
+        user.is_active = is_active
+        if is_active:
+            self.active[user.team_name].add(user_id)
+        else:
+            self.active[user.team_name].discard(user_id)
+        return _copy(user)
+
+    async def deactivate_team(
+        self,
+        team_name: str,
+        on_progress=None,
+        chunk_size: int = config.DEACTIVATE_CHUNK_SIZE,
+    ):
+        team = self.teams.get(team_name)
+        if team is None:
+            return None
+        deactivated = list(team)
+        for user_id in deactivated:
+            self.users[user_id].is_active = False
+        self.active[team_name].clear()
+
+        pr_ids = sorted(
+            {
+                pr_id
+                for user_id in deactivated
+                for pr_id in self.reviews.get(user_id, ())
+                if self.prs[pr_id].status == models.PRStatus.OPEN
+            }
+        )
+        strategy = get_strategy()
+        affected = 0
+        reassigned = 0
+        for start in range(0, len(pr_ids), chunk_size):
+            batch = pr_ids[start:start + chunk_size]
+            for pr_id in batch:
+                pr = self.prs[pr_id]
+                removed = [u for u in pr.reviewers if u in team]
+                for user_id in removed:
+                    self._unassign(pr, user_id, reason="deactivate")
+                # замена — из активных участников команды автора
+                author_team = self.users[pr.author_id].team_name
+                candidates = [
+                    u
+                    for u in self.active.get(author_team, ())
+                    if u != pr.author_id and u not in pr.reviewers
+                ]
+                picked = self._pick(strategy, candidates, len(removed))
+                self._assign(pr, picked, reason="deactivate")
+                pr.version += 1
+                reassigned += bool(picked)
+            affected += len(batch)
+            if on_progress is not None:
+                await on_progress(affected)
+
+        return {
+            "deactivated_users": deactivated,
+            "affected_pull_requests": affected,
+            "reassigned_pull_requests": reassigned,
+        }
+
+    async def rebalance_team(self, team_name: str, dry_run: bool):
+        team = self.teams.get(team_name)
+        if team is None:
+            return None
+        prs = [
+            (pr.pull_request_id, pr.author_id, pr.reviewers)
+            for pr in (
+                self.prs[pr_id]
+                for pr_id in {
+                    pr_id for u in team for pr_id in self.reviews.get(u, ())
+                }
+            )
+            if pr.status == models.PRStatus.OPEN
+        ]
+        moves, before, after = rebalance.plan_moves(
+            team, self.active[team_name], prs
+        )
+        result = rebalance.summary(moves, before, after)
+        if dry_run:
+            return result
+
+        for pr_id, old, new in moves:
+            pr = self.prs[pr_id]
+            pr.reviewers[pr.reviewers.index(old)] = new
+            self.reviews[old].discard(pr_id)
+            self.reviews[new].add(pr_id)
+            for user_id, delta in ((old, -1), (new, 1)):
+                self.open_reviews[user_id] += delta
+                self.assigned_reviews[user_id] += delta
+        for pr_id in {pr_id for pr_id, _, _ in moves}:
+            self.prs[pr_id].version += 1
+        _publish(rebalance.move_events(moves))
+        return result
+
+    # --- Pull Requests ---
+    def _candidates(self, author_id: str):
+        team_name = self.users[author_id].team_name
+        return [u for u in self.active.get(team_name, ()) if u != author_id]
+
+    async def create_pr(self, pr_id: str, pr_name: str, author_id: str):
+        if pr_id in self.prs:
+            return "exists", None, None
+        if author_id not in self.users:
+            return "author_or_team_not_found", None, None
+
+        assigned = self._pick(get_strategy(), self._candidates(author_id), 2)
+        pr = self.prs[pr_id] = MemoryPR(
+            pr_id, pr_name, author_id, models.PRStatus.OPEN, _now()
+        )
+        self._assign(pr, assigned)
+        return "created", _copy(pr), assigned
+
+    async def bulk_create_prs(self, items: list):
+        strategy = get_strategy()
+        # как и в Postgres, у PR одного запроса одно время создания
+        now = _now()
+        results = []
+        created = {}
+        for item in items:
+            pr_id = item.get("pull_request_id")
+            pr_name = item.get("pull_request_name")
+            author_id = item.get("author_id")
+            if not pr_id or not pr_name or not author_id:
+                results.append(("invalid", pr_id, None))
+                continue
+            if pr_id in self.prs:
+                results.append(("exists", pr_id, None))
+                continue
+            if author_id not in self.users:
+                results.append(("author_or_team_not_found", pr_id, None))
+                continue
+
+            assigned = self._pick(strategy, self._candidates(author_id), 2)
+            pr = self.prs[pr_id] = MemoryPR(
+                pr_id, pr_name, author_id, models.PRStatus.OPEN, now
+            )
+            self._assign(pr, assigned)
+            created[pr_id] = _copy(pr)
+            results.append(("created", pr_id, assigned))
+        return results, created
+
+    async def merge_pr(self, pr_id: str):
+        pr = self.prs.get(pr_id)
+        if pr is None:
+            return None
+        if pr.status == models.PRStatus.OPEN:
+            self._merge(pr, _now())
+        return _copy(pr)
+
+    async def bulk_merge_prs(self, pr_ids: list):
+        now = _now()
+        results = []
+        for pr_id in dict.fromkeys(pr_ids):
+            pr = self.prs.get(pr_id)
+            if pr is None:
+                results.append((pr_id, "not_found", None))
+                continue
+            status = "already_merged"
+            if pr.status == models.PRStatus.OPEN:
+                self._merge(pr, now)
+                status = "merged"
+            results.append((pr_id, status, _copy(pr)))
+        return results
+
+    async def reassign_reviewer(self, pr_id: str, old_user_id: str):
+        pr = self.prs.get(pr_id)
+        if pr is None:
+            return "pr_not_found", None, None, None
+        if pr.status == models.PRStatus.MERGED:
+            return "merged", None, None, None
+        if old_user_id not in pr.reviewers:
+            return "not_assigned", None, None, None
+
+        # замена — из команды заменяемого ревьюера
+        team_name = self.users[old_user_id].team_name
+        candidates = [
+            u
+            for u in self.active.get(team_name, ())
+            if u not in pr.reviewers and u != pr.author_id
+        ]
+        if not candidates:
+            return "no_candidate", None, None, None
+        new_reviewer = self._pick(get_strategy(), candidates, 1)[0]
+
+        # на месте прежнего: порядок ревьюеров как у UPDATE в Postgres
+        pr.reviewers[pr.reviewers.index(old_user_id)] = new_reviewer
+        pr.version += 1
+        self.reviews[old_user_id].discard(pr_id)
+        self.reviews[new_reviewer].add(pr_id)
+        for user_id, delta in ((old_user_id, -1), (new_reviewer, 1)):
+            self.open_reviews[user_id] += delta
+            self.assigned_reviews[user_id] += delta
+        _publish(
+            [
+                events.event_for(
+                    "unassigned", old_user_id, pr_id, replaced_by=new_reviewer
+                ),
+                events.event_for(
+                    "assigned", new_reviewer, pr_id, replaces=old_user_id
+                ),
+            ]
+        )
+        return "ok", _copy(pr), list(pr.reviewers), new_reviewer
+
+    # --- чтения ---
+    async def iter_reviews(self, user_id: str, status, after, limit: int):
+        prs = sorted(
+            (self.prs[pr_id] for pr_id in self.reviews.get(user_id, ())),
+            key=lambda pr: (pr.created_at, pr.pull_request_id),
+        )
+        count = 0
+        for pr in prs:
+            if count == limit:
+                break
+            if status is not None and pr.status != status:
+                continue
+            if after is not None and (pr.created_at, pr.pull_request_id) <= after:
+                continue
+            yield pr
+            count += 1
+
+    async def stats(self, limit: int, offset: int, top: Optional[int]) -> dict:
+        if top:
+            users = dict(
+                heapq.nlargest(
+                    top,
+                    self.assigned_reviews.items(),
+                    key=lambda item: (item[1], item[0]),
+                )
+            )
+        else:
+            users = {
+                user_id: self.assigned_reviews.get(user_id, 0)
+                for user_id in sorted(self.users)[offset:offset + limit]
+            }
+        prs = {
+            pr_id: len(self.prs[pr_id].reviewers)
+            for pr_id in sorted(self.prs)[offset:offset + limit]
+        }
+        return {"users": users, "pull_requests": prs}
+
+
+memory_repository = MemoryRepository()
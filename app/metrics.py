@@ -0,0 +1,388 @@
+"""Метрики в текстовом формате Prometheus.
+
+Запись — несколько операций со словарями на запрос и на SQL-запрос;
+текст собирается только при обращении к /metrics.
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+    10.0,
+)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+OPERATIONS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"))
+
+
+def _escape(value) -> str:
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _labels(names, values, extra="") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def _header(self):
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+
+    def render(self):
+        lines = self._header()
+        for values, child in sorted(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def _render_child(self, values, child):
+        labels = _labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_number(child.value)}"]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+
+class _Buckets:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=()):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def _new_child(self):
+        return _Buckets(self.buckets)
+
+    def _render_child(self, values, child):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), child.counts):
+            cumulative += count
+            labels = _labels(self.labelnames, values, f'le="{_number(bound)}"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_number(child.sum)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+REQUESTS = Counter(
+    "http_requests_total",
+    "HTTP requests by route and status code.",
+    ("method", "route", "status"),
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency including the streamed body.",
+    ("method", "route"),
+    LATENCY_BUCKETS,
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being served.")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries",
+    "SQL statements executed per HTTP request.",
+    ("method", "route"),
+    QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds",
+    "Time spent in SQL statements per HTTP request.",
+    ("method", "route"),
+    LATENCY_BUCKETS,
+)
+QUERY_LATENCY = Histogram(
+    "db_query_duration_seconds",
+    "SQL statement latency.",
+    ("operation",),
+    LATENCY_BUCKETS,
+)
+QUERY_ERRORS = Counter("db_query_errors_total", "Failed SQL statements.")
+POOL_WAIT = Histogram(
+    "db_pool_wait_seconds",
+    "Time to obtain a connection from the pool, including connecting.",
+    ("pool",),
+    LATENCY_BUCKETS,
+)
+POOL_TIMEOUTS = Counter(
+    "db_pool_timeouts_total",
+    "Connection requests that hit pool_timeout.",
+    ("pool",),
+)
+JOBS = Counter(
+    "jobs_total",
+    "Background jobs finished, by kind and outcome.",
+    ("kind", "outcome"),
+)
+READ_ROUTING = Counter(
+    "db_read_routing_total",
+    "Read sessions by target database and reason.",
+    ("target", "reason"),
+)
+EVENT_SUBSCRIBERS = Gauge(
+    "event_subscribers",
+    "Open /users/{user_id}/events streams in this process.",
+)
+
+REGISTRY = [
+    REQUESTS,
+    REQUEST_LATENCY,
+    IN_FLIGHT,
+    REQUEST_QUERIES,
+    REQUEST_DB_TIME,
+    QUERY_LATENCY,
+    QUERY_ERRORS,
+    POOL_WAIT,
+    POOL_TIMEOUTS,
+    JOBS,
+    READ_ROUTING,
+    EVENT_SUBSCRIBERS,
+]
+IN_FLIGHT.labels()
+EVENT_SUBSCRIBERS.labels()
+QUERY_ERRORS.labels()
+
+
+# --- Учёт SQL в рамках HTTP-запроса ---
+class RequestStats:
+    __slots__ = ("queries", "db_time")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+
+
+# greenlet-адаптер SQLAlchemy наследует контекст вызывающей корутины,
+# поэтому обработчики событий видят статистику текущего запроса
+current_request: ContextVar[Optional[RequestStats]] = ContextVar(
+    "current_request", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, many):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, many):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    operation = statement.lstrip().split(None, 1)[0].upper()
+    if operation not in OPERATIONS:
+        operation = "OTHER"
+    QUERY_LATENCY.labels(operation).observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(context):
+    started = context.connection and context.connection.info.get(
+        "query_started"
+    )
+    if started:
+        started.pop()
+    QUERY_ERRORS.labels().inc()
+
+
+_LISTENERS = (
+    ("before_cursor_execute", _before_cursor_execute),
+    ("after_cursor_execute", _after_cursor_execute),
+    ("handle_error", _handle_error),
+)
+
+
+def enable():
+    """Подключает учёт SQL к движкам; при METRICS_ENABLED=0 не вызывается,
+    и запросы к БД ничего лишнего не делают."""
+    for name, listener in _LISTENERS:
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+
+# --- Пул соединений ---
+_pools = {}
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, который меряет ожидание свободного соединения."""
+
+    metrics_name = "primary"
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            POOL_TIMEOUTS.labels(self.metrics_name).inc()
+            raise
+        finally:
+            POOL_WAIT.labels(self.metrics_name).observe(
+                time.perf_counter() - started
+            )
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics_name = self.metrics_name
+        return pool
+
+
+def register_engine(engine, name: str):
+    """Подписывает пул движка на метрики; пул перечитывается при каждом
+    scrape, поэтому пересоздание через engine.dispose() его не теряет."""
+    _pools[name] = engine
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics_name = name
+
+
+def _pool_lines():
+    lines = []
+    gauges = (
+        ("db_pool_size", "Configured pool size.", lambda p: p.size()),
+        (
+            "db_pool_checked_out",
+            "Connections currently checked out.",
+            lambda p: p.checkedout(),
+        ),
+        (
+            "db_pool_overflow",
+            "Connections opened above pool_size.",
+            lambda p: max(p.overflow(), 0),
+        ),
+        (
+            "db_pool_idle",
+            "Idle connections kept in the pool.",
+            lambda p: p.checkedin(),
+        ),
+    )
+    for metric, documentation, read in gauges:
+        lines.append(f"# HELP {metric} {documentation}")
+        lines.append(f"# TYPE {metric} gauge")
+        for name, engine in sorted(_pools.items()):
+            pool = engine.pool
+            if not hasattr(pool, "checkedout"):
+                continue
+            lines.append(f'{metric}{{pool="{_escape(name)}"}} {read(pool)}')
+    return lines
+
+
+def render() -> str:
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    lines.extend(_pool_lines())
+    return "\n".join(lines) + "\n"
+
+
+# --- ASGI middleware ---
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+        enable()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        in_flight = IN_FLIGHT.labels()
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - started
+            in_flight.dec()
+            current_request.reset(token)
+            # шаблон пути, а не сам путь: иначе id раздувают число серий
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            REQUESTS.labels(method, path, str(status)).inc()
+            REQUEST_LATENCY.labels(method, path).observe(elapsed)
+            REQUEST_QUERIES.labels(method, path).observe(stats.queries)
+            REQUEST_DB_TIME.labels(method, path).observe(stats.db_time)
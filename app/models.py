@@ -5,8 +5,15 @@ from sqlalchemy import (
     ForeignKey,
     Enum,
     Table,
+    Date,
     DateTime,
+    Float,
+    Index,
+    Integer,
+    LargeBinary,
+    SmallInteger,
 )
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -18,26 +25,37 @@ class PRStatus(str, enum.Enum):
     MERGED = "MERGED"
 
 
+# Связи не грузятся неявно: selectin по умолчанию каскадом тянул команду
+# и участников каждого ревьюера. Нужные связи подгружаются явно через
+# selectinload(), обращение к незагруженной — ошибка, а не скрытый запрос.
 class Team(Base):
     __tablename__ = "teams"
     team_name = Column(String, primary_key=True)
-    members = relationship("User", back_populates="team", lazy="selectin")
+    members = relationship("User", back_populates="team", lazy="raise")
 
 
 class User(Base):
     __tablename__ = "users"
     user_id = Column(String, primary_key=True)
     username = Column(String, nullable=False)
-    team_name = Column(String, ForeignKey("teams.team_name"))
+    team_name = Column(String, ForeignKey("teams.team_name"), index=True)
     is_active = Column(Boolean, default=True)
-    team = relationship("Team", back_populates="members", lazy="selectin")
+    team = relationship("Team", back_populates="members", lazy="raise")
 
 
 pr_reviewers = Table(
     "pr_reviewers",
     Base.metadata,
-    Column("pr_id", String, ForeignKey("pull_requests.pull_request_id")),
-    Column("user_id", String, ForeignKey("users.user_id")),
+    Column(
+        "pr_id",
+        String,
+        ForeignKey("pull_requests.pull_request_id"),
+        primary_key=True,
+    ),
+    Column(
+        "user_id", String, ForeignKey("users.user_id"), primary_key=True
+    ),
+    Index("ix_pr_reviewers_user_id_pr_id", "user_id", "pr_id"),
 )
 
 
@@ -48,7 +66,90 @@ class PullRequest(Base):
     author_id = Column(String, ForeignKey("users.user_id"), nullable=False)
     status = Column(Enum(PRStatus), default=PRStatus.OPEN)
     assigned_reviewers = relationship(
-        "User", secondary=pr_reviewers, lazy="selectin"
+        "User", secondary=pr_reviewers, lazy="raise"
     )
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     merged_at = Column(DateTime(timezone=True), nullable=True)
+    reviewers_count = Column(Integer, nullable=False, server_default="0")
+    # растёт при каждой смене ревьюеров или статуса: compare-and-swap
+    # в reassign отбрасывает решения, принятые по устаревшему составу
+    version = Column(Integer, nullable=False, server_default="0")
+
+    __table_args__ = (
+        Index("ix_pull_requests_status_created_at", "status", "created_at"),
+    )
+
+
+class ReviewerStats(Base):
+    __tablename__ = "reviewer_stats"
+    user_id = Column(String, ForeignKey("users.user_id"), primary_key=True)
+    open_reviews = Column(Integer, nullable=False, server_default="0")
+    assigned_reviews = Column(Integer, nullable=False, server_default="0")
+
+    __table_args__ = (
+        Index(
+            "ix_reviewer_stats_assigned_reviews", "assigned_reviews", "user_id"
+        ),
+    )
+
+
+# Дневные агрегаты для /stats/reviews; день — по UTC, команда — команда
+# автора PR. Пополняются в тех же statements, что создание и merge.
+class DailyTeamCounts(Base):
+    __tablename__ = "daily_team_counts"
+    day = Column(Date, primary_key=True)
+    team_name = Column(String, primary_key=True)
+    opened = Column(Integer, nullable=False, server_default="0")
+    merged = Column(Integer, nullable=False, server_default="0")
+
+
+class DailyTurnaround(Base):
+    """Гистограмма времени merged_at - created_at по корзинам
+    rollups.TURNAROUND_BUCKETS. reviewer_id = '' — PR в целом (уровень
+    команды), иначе — PR, где этот пользователь был ревьюером."""
+
+    __tablename__ = "daily_turnaround"
+    day = Column(Date, primary_key=True)
+    team_name = Column(String, primary_key=True)
+    reviewer_id = Column(String, primary_key=True)
+    bucket = Column(SmallInteger, primary_key=True)
+    merged = Column(Integer, nullable=False, server_default="0")
+    turnaround_sum = Column(Float, nullable=False, server_default="0")
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    # ключ клиента действует в пределах одного метода и пути
+    endpoint = Column(String, primary_key=True)
+    key = Column(String, primary_key=True)
+    fingerprint = Column(String, nullable=False)
+    # NULL — запрос ещё выполняется
+    status_code = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+    body = Column(LargeBinary, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+
+class Job(Base):
+    __tablename__ = "jobs"
+    job_id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    payload = Column(JSONB, nullable=False)
+    # queued -> running -> succeeded | failed
+    status = Column(String, nullable=False, server_default="queued")
+    attempts = Column(Integer, nullable=False, server_default="0")
+    progress_done = Column(Integer, nullable=False, server_default="0")
+    progress_total = Column(Integer, nullable=True)
+    result = Column(JSONB, nullable=True)
+    error = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    # воркер обновляет по таймеру и при каждом шаге; давно молчащая
+    # running-задача считается брошенной и забирается заново
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+    )
@@ -0,0 +1,115 @@
+"""Учёт SQL-запросов в рамках одного HTTP-запроса (opt-in).
+
+Включается QUERY_AUDIT=1 или из тестов через capture(). Считает
+выполненные statements, группирует их по «форме» (текст без параметров)
+и находит N+1 — одну и ту же форму, повторённую в запросе много раз.
+"""
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app import config
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDERS = re.compile(r"\$\d+(?:\s*,\s*\$\d+)*|%\(\w+\)s|\?")
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+\b")
+_SPACES = re.compile(r"\s+")
+
+
+def shape(statement: str) -> str:
+    """Текст запроса без значений: списки плейсхолдеров и литералы
+    схлопываются, чтобы IN (...) разной длины давал одну форму."""
+    statement = _PLACEHOLDERS.sub("?", statement)
+    statement = _LITERALS.sub("?", statement)
+    return _SPACES.sub(" ", statement).strip()
+
+
+class QueryAudit:
+    def __init__(self):
+        self.statements = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def shapes(self) -> Counter:
+        return Counter(shape(s) for s in self.statements)
+
+    def repeated(self, threshold: int = None) -> dict:
+        threshold = threshold or config.QUERY_AUDIT_REPEAT_THRESHOLD
+        return {s: n for s, n in self.shapes().items() if n >= threshold}
+
+    def report(self) -> str:
+        lines = [f"{self.count} statements"]
+        for statement, n in self.shapes().most_common():
+            lines.append(f"  {n} x {statement[:200]}")
+        return "\n".join(lines)
+
+
+# вложенные capture() (тест поверх middleware) видят одни и те же запросы
+active_audits: ContextVar[tuple] = ContextVar("active_audits", default=())
+
+
+def _record(conn, cursor, statement, parameters, context, executemany):
+    for audit in active_audits.get():
+        audit.statements.append(statement)
+
+
+def enable():
+    """Подключает обработчик к движкам; без него учёт ничего не стоит."""
+    if not event.contains(Engine, "after_cursor_execute", _record):
+        event.listen(Engine, "after_cursor_execute", _record)
+
+
+@contextmanager
+def capture():
+    """Собирает statements, выполненные внутри блока в текущем контексте."""
+    enable()
+    audit = QueryAudit()
+    token = active_audits.set(active_audits.get() + (audit,))
+    try:
+        yield audit
+    finally:
+        active_audits.reset(token)
+
+
+class QueryAuditMiddleware:
+    """Пишет в лог запросы, превысившие QUERY_AUDIT_BUDGET или
+    повторяющие одну форму statement не реже порога."""
+
+    def __init__(self, app):
+        self.app = app
+        enable()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with capture() as audit:
+            await self.app(scope, receive, send)
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        repeated = audit.repeated()
+        if repeated:
+            logger.warning(
+                "possible N+1 in %s %s: %s",
+                scope["method"],
+                route,
+                "; ".join(f"{n} x {s[:200]}" for s, n in repeated.items()),
+            )
+        budget = config.QUERY_AUDIT_BUDGET
+        if budget and audit.count > budget:
+            logger.warning(
+                "%s %s ran %d statements (budget %d)\n%s",
+                scope["method"],
+                route,
+                audit.count,
+                budget,
+                audit.report(),
+            )
@@ -0,0 +1,136 @@
+"""План перераспределения открытых ревью внутри команды.
+
+Уровнями сверху вниз: все участники с максимальной нагрузкой L отдают по
+одному PR активным участникам с нагрузкой не больше L - 2 (наименее
+загруженные — первыми, min-куча). Если хоть один не может отдать, максимум
+ниже L не опустить и ходы этого уровня отменяются — в план попадают только
+перестановки, которые действительно снижают максимум.
+"""
+import heapq
+from collections import Counter, defaultdict
+
+from app import events
+
+
+class _Plan:
+    def __init__(self, members, active, prs):
+        self.members = set(members)
+        self.active = set(active) & self.members
+        self.authors = {}
+        self.reviewers = {}
+        # PR, которые ревьюит участник команды, в порядке pull_request_id
+        self.held = defaultdict(list)
+        self.load = Counter({u: 0 for u in self.active})
+        for pr_id, author_id, reviewers in sorted(prs):
+            self.authors[pr_id] = author_id
+            self.reviewers[pr_id] = set(reviewers)
+            for user_id in reviewers:
+                if user_id in self.members:
+                    self.held[user_id].append(pr_id)
+                    self.load[user_id] += 1
+        self.targets = [(n, u) for u, n in self.load.items() if u in self.active]
+        heapq.heapify(self.targets)
+
+    def _push(self, user_id):
+        if user_id in self.active:
+            heapq.heappush(self.targets, (self.load[user_id], user_id))
+
+    def _find(self, source, level):
+        """Ход (pr_id, source, target) к наименее загруженному допустимому
+        участнику с нагрузкой <= level - 2 или None."""
+        skipped = []
+        found = None
+        while self.targets:
+            n, target = self.targets[0]
+            if n != self.load[target]:
+                heapq.heappop(self.targets)  # устаревшая запись
+                continue
+            if n > level - 2:
+                break
+            heapq.heappop(self.targets)
+            skipped.append(target)
+            found = next(
+                (
+                    pr_id
+                    for pr_id in self.held[source]
+                    if target not in self.reviewers[pr_id]
+                    and target != self.authors[pr_id]
+                ),
+                None,
+            )
+            if found is not None:
+                break
+        for user_id in skipped:
+            self._push(user_id)
+        if found is None:
+            return None
+        return found, source, skipped[-1]
+
+    def _apply(self, move, undo=False):
+        pr_id, old, new = move
+        if undo:
+            old, new = new, old
+        self.reviewers[pr_id].remove(old)
+        self.reviewers[pr_id].add(new)
+        self.held[old].remove(pr_id)
+        self.held[new].append(pr_id)
+        self.load[old] -= 1
+        self.load[new] += 1
+        self._push(old)
+        self._push(new)
+
+    def run(self) -> list:
+        moves = []
+        while self.load:
+            level = max(self.load.values())
+            log = []
+            for source in sorted(u for u, n in self.load.items() if n == level):
+                move = self._find(source, level)
+                if move is None:
+                    for done in reversed(log):
+                        self._apply(done, undo=True)
+                    return moves
+                self._apply(move)
+                log.append(move)
+            moves.extend(log)
+        return moves
+
+
+def plan_moves(members, active, prs):
+    """Перестановки (pr_id, old_user_id, new_user_id), снижающие
+    максимальную нагрузку участников members.
+
+    prs — открытые PR (pr_id, author_id, reviewers), где ревьюит кто-то из
+    members; новые ревьюеры — только из active, не автор и не уже ревьюер.
+    Возвращает (moves, максимум до, максимум после).
+    """
+    plan = _Plan(members, active, prs)
+    before = max(plan.load.values(), default=0)
+    moves = plan.run()
+    return moves, before, max(plan.load.values(), default=0)
+
+
+def summary(moves, before: int, after: int) -> dict:
+    return {
+        "moves": [
+            {"pull_request_id": pr_id, "old_user_id": old, "new_user_id": new}
+            for pr_id, old, new in moves
+        ],
+        "max_open_before": before,
+        "max_open_after": after,
+    }
+
+
+def move_events(moves) -> list:
+    return [
+        event
+        for pr_id, old, new in moves
+        for event in (
+            events.event_for(
+                "unassigned", old, pr_id, replaced_by=new, reason="rebalance"
+            ),
+            events.event_for(
+                "assigned", new, pr_id, replaces=old, reason="rebalance"
+            ),
+        )
+    ]
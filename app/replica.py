@@ -0,0 +1,121 @@
+"""Чтение с реплики для GET-маршрутов.
+
+Сессия для чтения берётся с реплики, если она задана
+(DATABASE_REPLICA_URL) и доступна, иначе с primary. Клиент, который
+только что писал, читает с primary: после успешной записи ему ставится
+cookie на REPLICA_PIN_SECONDS, то же делает заголовок X-Read-Primary: 1.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, Request
+from sqlalchemy.exc import SQLAlchemyError
+
+from app import config, metrics
+from app.database import get_replica_session_factory, get_session_factory
+
+PIN_COOKIE = "read_primary"
+PIN_HEADER = "x-read-primary"
+READ_METHODS = frozenset(("GET", "HEAD", "OPTIONS"))
+CONNECT_ERRORS = (OSError, asyncio.TimeoutError, SQLAlchemyError)
+
+
+class ReplicaHealth:
+    """После ошибки подключения реплика пропускается retry_after секунд,
+    чтобы запросы не ждали таймаут соединения один за другим."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        self.down_until = 0.0
+
+    def available(self) -> bool:
+        return time.monotonic() >= self.down_until
+
+    def mark_down(self):
+        self.down_until = time.monotonic() + self.retry_after
+
+    def reset(self):
+        self.down_until = 0.0
+
+
+health = ReplicaHealth(config.REPLICA_RETRY_AFTER)
+
+
+def pinned(request: Request) -> bool:
+    return (
+        request.headers.get(PIN_HEADER) == "1"
+        or PIN_COOKIE in request.cookies
+    )
+
+
+def read_session_factory(replica, primary):
+    @asynccontextmanager
+    async def factory():
+        session = replica()
+        try:
+            # соединение берётся сразу: недоступная реплика видна здесь,
+            # а не посреди ответа
+            await session.connection()
+        except CONNECT_ERRORS:
+            await session.close()
+            health.mark_down()
+            metrics.READ_ROUTING.labels("primary", "replica_down").inc()
+            session = primary()
+        else:
+            metrics.READ_ROUTING.labels("replica", "replica").inc()
+        async with session:
+            yield session
+
+    return factory
+
+
+def get_read_session_factory(
+    request: Request,
+    primary=Depends(get_session_factory),
+    replica=Depends(get_replica_session_factory),
+):
+    if replica is None:
+        return primary
+    if pinned(request):
+        metrics.READ_ROUTING.labels("primary", "pinned").inc()
+        return primary
+    if not health.available():
+        metrics.READ_ROUTING.labels("primary", "replica_down").inc()
+        return primary
+    return read_session_factory(replica, primary)
+
+
+async def get_read_db(session_factory=Depends(get_read_session_factory)):
+    async with session_factory() as session:
+        yield session
+
+
+class ReadYourWritesMiddleware:
+    """Успешная запись ставит cookie, которое на REPLICA_PIN_SECONDS
+    направляет чтения клиента на primary: реплика может отставать."""
+
+    def __init__(self, app, pin_seconds: int = None):
+        self.app = app
+        self.pin_seconds = pin_seconds or config.REPLICA_PIN_SECONDS
+        self.cookie = (
+            f"{PIN_COOKIE}=1; Max-Age={self.pin_seconds}; Path=/; "
+            "HttpOnly; SameSite=Lax"
+        ).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def pin(message):
+            if (
+                message["type"] == "http.response.start"
+                and message["status"] < 400
+            ):
+                message["headers"] = list(message.get("headers", ())) + [
+                    (b"set-cookie", self.cookie)
+                ]
+            await send(message)
+
+        await self.app(scope, receive, pin)
@@ -0,0 +1,254 @@
+"""Хранилище команд, пользователей, PR и назначений для роутеров.
+
+Роутеры работают с Repository, а не с сессией: REPOSITORY_BACKEND=postgres
+(по умолчанию) — SqlRepository поверх crud, memory — MemoryRepository
+(app.memory_repository) в памяти процесса, для симуляций и тестов без БД.
+Методы возвращают те же статусы и строки, что и функции crud.
+"""
+from abc import ABC, abstractmethod
+from typing import Optional
+
+from fastapi import Depends
+from sqlalchemy import func, select, tuple_
+from sqlalchemy.orm import selectinload
+
+from app import config, crud, jobs, models
+from app.database import get_session_factory
+from app.replica import get_read_session_factory
+
+BACKENDS = ("postgres", "memory")
+if config.REPOSITORY_BACKEND not in BACKENDS:
+    raise ValueError(
+        f"unknown REPOSITORY_BACKEND {config.REPOSITORY_BACKEND!r}, "
+        f"expected one of {list(BACKENDS)}"
+    )
+
+
+class BackendNotSupported(RuntimeError):
+    """Возможность есть только у Postgres-хранилища (очередь задач,
+    выгрузка, дневные агрегаты); отдаётся как 501."""
+
+
+class Repository(ABC):
+    """Обязательные методы абстрактны: хранилище без одного из них не
+    создаётся. Возможности только Postgres — по умолчанию 501."""
+
+    @abstractmethod
+    async def upsert_team(self, team_name: str, members: list):
+        """Создаёт команду и добавляет/обновляет участников; весь состав."""
+
+    @abstractmethod
+    async def get_team(self, team_name: str):
+        """Участники команды (user_id, username, is_active) или None."""
+
+    @abstractmethod
+    async def team_exists(self, team_name: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def set_user_active(self, user_id: str, is_active: bool):
+        ...
+
+    @abstractmethod
+    async def deactivate_team(self, team_name: str, on_progress=None):
+        ...
+
+    @abstractmethod
+    async def rebalance_team(self, team_name: str, dry_run: bool):
+        """Перестановки ревьюеров открытых PR команды (app.rebalance) или
+        None, если команды нет."""
+
+    @abstractmethod
+    async def create_pr(self, pr_id: str, pr_name: str, author_id: str):
+        ...
+
+    @abstractmethod
+    async def bulk_create_prs(self, items: list):
+        ...
+
+    @abstractmethod
+    async def merge_pr(self, pr_id: str):
+        ...
+
+    @abstractmethod
+    async def bulk_merge_prs(self, pr_ids: list):
+        ...
+
+    @abstractmethod
+    async def reassign_reviewer(self, pr_id: str, old_user_id: str):
+        ...
+
+    @abstractmethod
+    def iter_reviews(self, user_id: str, status, after, limit: int):
+        """Асинхронный итератор PR ревьюера по (created_at, pull_request_id)
+        после ключа after, не больше limit."""
+
+    @abstractmethod
+    async def stats(self, limit: int, offset: int, top: Optional[int]) -> dict:
+        ...
+
+    async def enqueue_job(
+        self, kind: str, payload: dict, total: Optional[int] = None
+    ) -> str:
+        raise BackendNotSupported("background jobs")
+
+
+class SqlRepository(Repository):
+    """Postgres: сессия на вызов из session_factory."""
+
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+
+    async def upsert_team(self, team_name: str, members: list):
+        async with self.session_factory() as db:
+            return await crud.upsert_team(db, team_name, members)
+
+    async def get_team(self, team_name: str):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(models.Team)
+                .options(selectinload(models.Team.members))
+                .where(models.Team.team_name == team_name)
+            )
+            team = result.scalar_one_or_none()
+        return team.members if team is not None else None
+
+    async def team_exists(self, team_name: str) -> bool:
+        async with self.session_factory() as db:
+            return await db.get(models.Team, team_name) is not None
+
+    async def set_user_active(self, user_id: str, is_active: bool):
+        async with self.session_factory() as db:
+            return await crud.set_user_active(db, user_id, is_active)
+
+    async def deactivate_team(self, team_name: str, on_progress=None):
+        async with self.session_factory() as db:
+            return await crud.deactivate_team(
+                db, team_name, on_progress=on_progress
+            )
+
+    async def rebalance_team(self, team_name: str, dry_run: bool):
+        async with self.session_factory() as db:
+            return await crud.rebalance_team(db, team_name, dry_run)
+
+    async def create_pr(self, pr_id: str, pr_name: str, author_id: str):
+        async with self.session_factory() as db:
+            return await crud.create_pr(db, pr_id, pr_name, author_id)
+
+    async def bulk_create_prs(self, items: list):
+        async with self.session_factory() as db:
+            return await crud.bulk_create_prs(db, items)
+
+    async def merge_pr(self, pr_id: str):
+        async with self.session_factory() as db:
+            return await crud.merge_pr(db, pr_id)
+
+    async def bulk_merge_prs(self, pr_ids: list):
+        async with self.session_factory() as db:
+            return await crud.bulk_merge_prs(db, pr_ids)
+
+    async def reassign_reviewer(self, pr_id: str, old_user_id: str):
+        async with self.session_factory() as db:
+            return await crud.reassign_reviewer(db, pr_id, old_user_id)
+
+    async def iter_reviews(self, user_id: str, status, after, limit: int):
+        pr = models.PullRequest
+        stmt = (
+            select(
+                pr.pull_request_id,
+                pr.pull_request_name,
+                pr.author_id,
+                pr.status,
+                pr.created_at,
+            )
+            .join(
+                models.pr_reviewers,
+                models.pr_reviewers.c.pr_id == pr.pull_request_id,
+            )
+            .where(models.pr_reviewers.c.user_id == user_id)
+            .order_by(pr.created_at, pr.pull_request_id)
+            .limit(limit)
+        )
+        if status is not None:
+            stmt = stmt.where(pr.status == status)
+        if after is not None:
+            stmt = stmt.where(tuple_(pr.created_at, pr.pull_request_id) > after)
+
+        async with self.session_factory() as session:
+            result = await session.stream(stmt)
+            try:
+                async for row in result:
+                    yield row
+            finally:
+                await result.close()
+
+    async def stats(self, limit: int, offset: int, top: Optional[int]) -> dict:
+        # счётчики поддерживаются при записи (reviewer_stats,
+        # reviewers_count), здесь только чтение одной страницы по индексу
+        stats = models.ReviewerStats
+        if top:
+            users_query = (
+                select(stats.user_id, stats.assigned_reviews)
+                .order_by(stats.assigned_reviews.desc(), stats.user_id.desc())
+                .limit(top)
+            )
+        else:
+            users_query = (
+                select(
+                    models.User.user_id,
+                    func.coalesce(stats.assigned_reviews, 0),
+                )
+                .outerjoin(stats, stats.user_id == models.User.user_id)
+                .order_by(models.User.user_id)
+                .limit(limit)
+                .offset(offset)
+            )
+        prs_query = (
+            select(
+                models.PullRequest.pull_request_id,
+                models.PullRequest.reviewers_count,
+            )
+            .order_by(models.PullRequest.pull_request_id)
+            .limit(limit)
+            .offset(offset)
+        )
+        async with self.session_factory() as db:
+            users = dict((await db.execute(users_query)).all())
+            prs = dict((await db.execute(prs_query)).all())
+        return {"users": users, "pull_requests": prs}
+
+    async def enqueue_job(
+        self, kind: str, payload: dict, total: Optional[int] = None
+    ) -> str:
+        async with self.session_factory() as db:
+            return await jobs.enqueue(db, kind, payload, total=total)
+
+
+def memory_backend() -> bool:
+    return config.REPOSITORY_BACKEND == "memory"
+
+
+def _repository(session_factory) -> Repository:
+    if memory_backend():
+        # импорт здесь: memory_repository сам импортирует этот модуль
+        from app.memory_repository import memory_repository
+
+        return memory_repository
+    return SqlRepository(session_factory)
+
+
+def get_repository(session_factory=Depends(get_session_factory)) -> Repository:
+    return _repository(session_factory)
+
+
+def get_read_repository(
+    session_factory=Depends(get_read_session_factory),
+) -> Repository:
+    # чтения с реплики, если она настроена (app.replica)
+    return _repository(session_factory)
+
+
+def require_database():
+    """Зависимость маршрутов, которым нужен Postgres."""
+    if memory_backend():
+        raise BackendNotSupported("this endpoint")
@@ -0,0 +1,29 @@
+"""Быстрая сериализация ответов.
+
+Обработчики горячих маршрутов собирают ответ из данных, уже проверенных
+при записи или прочитанных из БД, и возвращают готовый Response: FastAPI
+не прогоняет его повторно через response_model (он остаётся для OpenAPI).
+"""
+import orjson
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from app import config
+
+DefaultResponse = ORJSONResponse if config.FAST_JSON else JSONResponse
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content)
+
+
+def prevalidated(content, status_code: int = 200):
+    return DefaultResponse(content, status_code=status_code)
+
+
+def accepted(job_id: str):
+    """202 для запроса, поставленного в очередь фоновых задач."""
+    response = DefaultResponse(
+        {"job_id": job_id, "status": "queued"}, status_code=202
+    )
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return response
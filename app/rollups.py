@@ -0,0 +1,341 @@
+"""Дневные агрегаты ревью для /stats/reviews.
+
+Создание и merge PR пополняют daily_team_counts и daily_turnaround в том
+же statement, что и сама запись (дополнительные CTE), поэтому отчёт за
+окно читает по несколько строк на день, а не всю таблицу pull_requests.
+Время ревью хранится гистограммой по фиксированным корзинам: её можно
+складывать по дням, а перцентили оцениваются интерполяцией внутри корзины.
+
+    python -m app.rollups backfill [--from 2024-01-01] [--to 2024-12-31]
+
+пересчитывает агрегаты за период из pull_requests (например, после
+миграции или ручной правки данных).
+"""
+import argparse
+import asyncio
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import Float, delete, func, literal, select, text, union_all
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app import models
+
+# нижние границы корзин, секунды: до минуты, 5 и 15 минут, ... 30 дней
+TURNAROUND_BUCKETS = (
+    60,
+    300,
+    900,
+    1800,
+    3600,
+    7200,
+    14400,
+    28800,
+    43200,
+    86400,
+    172800,
+    259200,
+    432000,
+    604800,
+    1209600,
+    2592000,
+)
+PERCENTILES = (50, 90, 99)
+
+
+def utc_day(column):
+    return func.date(func.timezone("UTC", column))
+
+
+def bucket_of(seconds):
+    # width_bucket по порогам совпадает с bisect_right по TURNAROUND_BUCKETS
+    return func.width_bucket(
+        seconds, literal(list(TURNAROUND_BUCKETS), ARRAY(Float))
+    )
+
+
+def _team_of(author_id_column):
+    return func.coalesce(
+        select(models.User.team_name)
+        .where(models.User.user_id == author_id_column)
+        .scalar_subquery(),
+        "",
+    )
+
+
+def count_opened(created):
+    """CTE, добавляющая созданные PR (CTE с author_id и created_at)
+    в daily_team_counts.opened."""
+    counts = models.DailyTeamCounts
+    day = utc_day(created.c.created_at)
+    team = _team_of(created.c.author_id)
+    stmt = pg_insert(counts).from_select(
+        ["day", "team_name", "opened"],
+        select(day, team, func.count()).group_by(day, team),
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[counts.day, counts.team_name],
+        set_={"opened": counts.opened + stmt.excluded.opened},
+    ).cte("rollup_opened")
+
+
+def count_merged(merged):
+    """CTE, учитывающие смерженные PR (CTE с author_id, created_at,
+    merged_at и reviewers) в daily_team_counts и daily_turnaround."""
+    counts = models.DailyTeamCounts
+    turnaround = models.DailyTurnaround
+    seconds = func.extract("epoch", merged.c.merged_at - merged.c.created_at)
+    prs = select(
+        utc_day(merged.c.merged_at).label("day"),
+        _team_of(merged.c.author_id).label("team_name"),
+        merged.c.reviewers,
+        seconds.label("seconds"),
+        bucket_of(seconds).label("bucket"),
+    ).cte("rollup_prs")
+
+    stmt = pg_insert(counts).from_select(
+        ["day", "team_name", "merged"],
+        select(prs.c.day, prs.c.team_name, func.count()).group_by(
+            prs.c.day, prs.c.team_name
+        ),
+    )
+    merged_counts = stmt.on_conflict_do_update(
+        index_elements=[counts.day, counts.team_name],
+        set_={"merged": counts.merged + stmt.excluded.merged},
+    ).cte("rollup_merged")
+
+    reviewer = func.unnest(prs.c.reviewers)
+    by_team = select(
+        prs.c.day,
+        prs.c.team_name,
+        literal("").label("reviewer_id"),
+        prs.c.bucket,
+        func.count(),
+        func.sum(prs.c.seconds),
+    ).group_by(prs.c.day, prs.c.team_name, prs.c.bucket)
+    by_reviewer = select(
+        prs.c.day,
+        prs.c.team_name,
+        reviewer,
+        prs.c.bucket,
+        func.count(),
+        func.sum(prs.c.seconds),
+    ).group_by(prs.c.day, prs.c.team_name, reviewer, prs.c.bucket)
+    stmt = pg_insert(turnaround).from_select(
+        [
+            "day",
+            "team_name",
+            "reviewer_id",
+            "bucket",
+            "merged",
+            "turnaround_sum",
+        ],
+        union_all(by_team, by_reviewer),
+    )
+    histogram = stmt.on_conflict_do_update(
+        index_elements=[
+            turnaround.day,
+            turnaround.team_name,
+            turnaround.reviewer_id,
+            turnaround.bucket,
+        ],
+        set_={
+            "merged": turnaround.merged + stmt.excluded.merged,
+            "turnaround_sum": turnaround.turnaround_sum
+            + stmt.excluded.turnaround_sum,
+        },
+    ).cte("rollup_turnaround")
+    return merged_counts, histogram
+
+
+def _utc_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+async def backfill(db: AsyncSession, start: date, end: date):
+    """Пересчитывает агрегаты за дни [start, end] из pull_requests."""
+    pr = models.PullRequest
+    since, until = _utc_start(start), _utc_start(end + timedelta(days=1))
+    # живые инкременты ждут пересчёта, иначе PR, смерженный между DELETE
+    # и INSERT, попал бы в агрегат дважды
+    await db.execute(
+        text(
+            "LOCK TABLE daily_team_counts, daily_turnaround "
+            "IN SHARE ROW EXCLUSIVE MODE"
+        )
+    )
+    for table in (models.DailyTeamCounts, models.DailyTurnaround):
+        await db.execute(
+            delete(table).where(table.day >= start, table.day <= end)
+        )
+
+    created = (
+        select(pr.author_id, pr.created_at)
+        .where(pr.created_at >= since, pr.created_at < until)
+        .cte("created")
+    )
+    await db.execute(
+        select(func.count()).select_from(created).add_cte(count_opened(created))
+    )
+
+    reviewers = func.array(
+        select(models.pr_reviewers.c.user_id)
+        .where(models.pr_reviewers.c.pr_id == pr.pull_request_id)
+        .scalar_subquery()
+    ).label("reviewers")
+    merged = (
+        select(pr.author_id, pr.created_at, pr.merged_at, reviewers)
+        .where(
+            pr.status == models.PRStatus.MERGED,
+            pr.merged_at >= since,
+            pr.merged_at < until,
+        )
+        .cte("merged")
+    )
+    await db.execute(
+        select(func.count())
+        .select_from(merged)
+        .add_cte(*count_merged(merged))
+    )
+    await db.commit()
+
+
+def percentile(histogram: list, q: float) -> Optional[float]:
+    """Оценка q-го перцентиля по счётчикам корзин: линейно внутри корзины,
+    для последней (открытой) корзины — её нижняя граница."""
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = total * q / 100
+    seen = 0
+    bounds = (0,) + TURNAROUND_BUCKETS
+    for bucket, count in enumerate(histogram):
+        if count and seen + count >= rank:
+            if bucket >= len(TURNAROUND_BUCKETS):
+                return float(bounds[bucket])
+            low, high = bounds[bucket], bounds[bucket + 1]
+            return low + (high - low) * (rank - seen) / count
+        seen += count
+    return float(bounds[-1])
+
+
+def _summary(histogram: list, total_seconds: float) -> dict:
+    merged = sum(histogram)
+    summary = {
+        "merged": merged,
+        "mean_seconds": round(total_seconds / merged, 3) if merged else None,
+    }
+    for q in PERCENTILES:
+        summary[f"p{q}_seconds"] = percentile(histogram, q)
+    return summary
+
+
+async def review_stats(
+    db: AsyncSession, start: date, end: date, team_name: Optional[str]
+) -> dict:
+    counts = models.DailyTeamCounts
+    turnaround = models.DailyTurnaround
+
+    days_query = (
+        select(counts.day, func.sum(counts.opened), func.sum(counts.merged))
+        .where(counts.day >= start, counts.day <= end)
+        .group_by(counts.day)
+    )
+    histogram_query = (
+        select(
+            turnaround.team_name,
+            turnaround.reviewer_id,
+            turnaround.bucket,
+            func.sum(turnaround.merged),
+            func.sum(turnaround.turnaround_sum),
+        )
+        .where(turnaround.day >= start, turnaround.day <= end)
+        .group_by(
+            turnaround.team_name, turnaround.reviewer_id, turnaround.bucket
+        )
+    )
+    if team_name is not None:
+        days_query = days_query.where(counts.team_name == team_name)
+        histogram_query = histogram_query.where(
+            turnaround.team_name == team_name
+        )
+
+    by_day = {
+        day: (opened, merged)
+        for day, opened, merged in (await db.execute(days_query)).all()
+    }
+    days = []
+    day = start
+    while day <= end:
+        opened, merged = by_day.get(day, (0, 0))
+        days.append({"date": day.isoformat(), "opened": opened, "merged": merged})
+        day += timedelta(days=1)
+
+    size = len(TURNAROUND_BUCKETS) + 1
+    teams, reviewers = {}, {}
+    overall = [[0] * size, 0.0]
+    for team, reviewer_id, bucket, merged, seconds in (
+        await db.execute(histogram_query)
+    ).all():
+        if reviewer_id:
+            targets = (reviewers.setdefault(reviewer_id, [[0] * size, 0.0]),)
+        else:
+            targets = (teams.setdefault(team, [[0] * size, 0.0]), overall)
+        for target in targets:
+            target[0][bucket] += merged
+            target[1] += seconds
+
+    return {
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "team_name": team_name,
+        "days": days,
+        "turnaround": _summary(*overall),
+        "teams": [
+            {"team_name": team, **_summary(*teams[team])}
+            for team in sorted(teams)
+        ],
+        "reviewers": [
+            {"user_id": user_id, **_summary(*reviewers[user_id])}
+            for user_id in sorted(reviewers)
+        ],
+    }
+
+
+async def _run_backfill(start: Optional[date], end: Optional[date]):
+    from app.database import AsyncSessionLocal, engine
+
+    try:
+        async with AsyncSessionLocal() as db:
+            if start is None:
+                first = await db.scalar(
+                    select(func.min(utc_day(models.PullRequest.created_at)))
+                )
+                start = first or datetime.now(timezone.utc).date()
+            end = end or datetime.now(timezone.utc).date()
+            await backfill(db, start, end)
+        print(f"rollups rebuilt for {start} .. {end}")
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.rollups")
+    commands = parser.add_subparsers(dest="command", required=True)
+    command = commands.add_parser(
+        "backfill", help="rebuild daily rollups from pull_requests"
+    )
+    command.add_argument(
+        "--from", dest="start", type=date.fromisoformat, default=None
+    )
+    command.add_argument(
+        "--to", dest="end", type=date.fromisoformat, default=None
+    )
+    args = parser.parse_args(argv)
+    asyncio.run(_run_backfill(args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+from app import config
+
+
+@dataclass(frozen=True)
+class Roster:
+    team_name: str
+    members: FrozenSet[str]
+    active: Tuple[str, ...]
+
+
+class TeamRosterCache:
+    """LRU-кэш составов команд с TTL и версиями.
+
+    Версия команды увеличивается при каждой инвалидации, поэтому загрузка,
+    начатая до изменения состава, не попадёт в кэш после него.
+    """
+
+    def __init__(self, max_teams: int, ttl: float):
+        self.max_teams = max_teams
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Roster]]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._user_team: Dict[str, str] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def version(self, team_name: str) -> int:
+        return self._versions.get(team_name, 0)
+
+    def get(self, team_name: str) -> Optional[Roster]:
+        entry = self._entries.get(team_name)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, roster = entry
+        if expires_at < time.monotonic():
+            self._drop(team_name)
+            self.evictions += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(team_name)
+        self.hits += 1
+        return roster
+
+    def team_of(self, user_id: str) -> Optional[str]:
+        team_name = self._user_team.get(user_id)
+        if team_name is None or team_name not in self._entries:
+            return None
+        return team_name
+
+    def put(self, roster: Roster, version: int) -> bool:
+        if self.max_teams <= 0 or version != self.version(roster.team_name):
+            return False
+        self._drop(roster.team_name)
+        self._entries[roster.team_name] = (
+            time.monotonic() + self.ttl,
+            roster,
+        )
+        for user_id in roster.members:
+            self._user_team[user_id] = roster.team_name
+        while len(self._entries) > self.max_teams:
+            oldest = next(iter(self._entries))
+            self._drop(oldest)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, team_name: str):
+        self._versions[team_name] = self.version(team_name) + 1
+        self.invalidations += 1
+        self._drop(team_name)
+
+    def invalidate_users(self, user_ids: Iterable[str]):
+        teams = {self._user_team.get(u) for u in user_ids}
+        for team_name in teams - {None}:
+            self.invalidate(team_name)
+
+    def clear(self):
+        for team_name in list(self._entries):
+            self.invalidate(team_name)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_teams,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _drop(self, team_name: str):
+        entry = self._entries.pop(team_name, None)
+        if entry is None:
+            return
+        for user_id in entry[1].members:
+            if self._user_team.get(user_id) == team_name:
+                del self._user_team[user_id]
+
+
+roster_cache = TeamRosterCache(
+    config.ROSTER_CACHE_SIZE, config.ROSTER_CACHE_TTL
+)
@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_db
+from app import jobs
+from app.repository import require_database
+from app.responses import prevalidated
+
+router = APIRouter(dependencies=[Depends(require_database)])
+
+
+def job_response(job) -> dict:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "progress": {"done": job.progress_done, "total": job.progress_total},
+        "result": job.result,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": (
+            job.finished_at.isoformat() if job.finished_at else None
+        ),
+    }
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str, db: AsyncSession = Depends(get_db)):
+    job = await jobs.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error": {"code": "NOT_FOUND", "message": "resource not found"}
+            },
+        )
+    return prevalidated(job_response(job))
@@ -1,24 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from app.database import get_db
-from app import crud, schemas, models
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app import schemas
+from app.repository import Repository, get_repository
+from app.responses import accepted, prevalidated
 
 router = APIRouter()
 
+BULK_MAX_ITEMS = 1000
+# в фоновой задаче элементы обрабатываются пачками по JOB_BATCH_SIZE
+BULK_ASYNC_MAX_ITEMS = 100000
+BULK_FIELDS = ("pull_request_id", "pull_request_name", "author_id")
 
-async def get_pr_with_reviewers(db: AsyncSession, pr_id: str):
-    result = await db.execute(
-        select(models.PullRequest)
-        .options(selectinload(models.PullRequest.assigned_reviewers))
-        .where(models.PullRequest.pull_request_id == pr_id)
-    )
-    return result.scalar_one_or_none()
+BULK_ERRORS = {
+    "invalid": (
+        400,
+        "BAD_REQUEST",
+        "pull_request_id, pull_request_name and author_id required",
+    ),
+    "exists": (409, "PR_EXISTS", "PR id already exists"),
+    "author_or_team_not_found": (404, "NOT_FOUND", "author or team not found"),
+}
+
+
+def pr_response(pr, assigned_reviewers) -> dict:
+    # ответ собирается из RETURNING записи, без повторного чтения PR;
+    # поля совпадают с schemas.PullRequest, но без повторной валидации
+    return {
+        "pull_request_id": pr.pull_request_id,
+        "pull_request_name": pr.pull_request_name,
+        "author_id": pr.author_id,
+        "status": pr.status.value,
+        "assigned_reviewers": list(assigned_reviewers),
+        "createdAt": pr.created_at.isoformat() if pr.created_at else None,
+        "mergedAt": pr.merged_at.isoformat() if pr.merged_at else None,
+    }
 
 
 @router.post("/create", response_model=schemas.PullRequest, status_code=201)
-async def create_pr(payload: dict, db: AsyncSession = Depends(get_db)):
+async def create_pr(
+    payload: dict, repo: Repository = Depends(get_repository)
+):
     pr_id = payload.get("pull_request_id")
     pr_name = payload.get("pull_request_name")
     author_id = payload.get("author_id")
@@ -28,7 +48,7 @@ async def create_pr(payload: dict, db: AsyncSession = Depends(get_db)):
             detail="pull_request_id, pull_request_name and author_id required",
         )
 
-    status, pr = await crud.create_pr(db, pr_id, pr_name, author_id)
+    status, pr, assigned = await repo.create_pr(pr_id, pr_name, author_id)
     if status == "exists":
         raise HTTPException(
             status_code=409,
@@ -50,52 +70,144 @@ async def create_pr(payload: dict, db: AsyncSession = Depends(get_db)):
             },
         )
 
-    pr = await get_pr_with_reviewers(db, pr.pull_request_id)
-    if not pr:
+    return prevalidated(pr_response(pr, assigned), status_code=201)
+
+
+def bulk_results(results, created) -> list:
+    response = []
+    for status, pr_id, assigned in results:
+        if status == "created":
+            pr = created[pr_id]
+            response.append(
+                {
+                    "pull_request_id": pr_id,
+                    "status_code": 201,
+                    "pr": pr_response(pr, assigned),
+                }
+            )
+            continue
+
+        status_code, code, message = BULK_ERRORS[status]
+        response.append(
+            {
+                "pull_request_id": pr_id,
+                "status_code": status_code,
+                "error": {"code": code, "message": message},
+            }
+        )
+    return response
+
+
+@router.post("/bulkCreate")
+async def bulk_create_prs(
+    payload: dict,
+    run_async: bool = Query(False, alias="async"),
+    repo: Repository = Depends(get_repository),
+):
+    items = payload.get("pull_requests")
+    if not isinstance(items, list) or not items:
+        raise HTTPException(
+            status_code=400, detail="pull_requests list required"
+        )
+    max_items = BULK_ASYNC_MAX_ITEMS if run_async else BULK_MAX_ITEMS
+    if len(items) > max_items:
         raise HTTPException(
-            status_code=500, detail="failed to load created PR"
+            status_code=400,
+            detail=f"at most {max_items} pull_requests per request",
+        )
+    if not all(isinstance(i, dict) for i in items):
+        raise HTTPException(
+            status_code=400, detail="pull_requests items must be objects"
+        )
+    # пустое или отсутствующее поле — ошибка одного элемента (BAD_REQUEST
+    # в results); поле другого типа отклоняет весь запрос, иначе оно
+    # упало бы с 500 в запросе к БД или в фоновой задаче
+    if not all(
+        isinstance(i.get(field), (str, type(None)))
+        for i in items
+        for field in BULK_FIELDS
+    ):
+        raise HTTPException(
+            status_code=400,
+            detail=f"pull_requests fields {', '.join(BULK_FIELDS)} "
+            "must be strings",
         )
 
-    return {
-        "pull_request_id": pr.pull_request_id,
-        "pull_request_name": pr.pull_request_name,
-        "author_id": pr.author_id,
-        "status": (
-            pr.status.value if hasattr(pr.status, "value") else pr.status
-        ),
-        "assigned_reviewers": [u.user_id for u in pr.assigned_reviewers],
-        "createdAt": pr.created_at.isoformat() if pr.created_at else None,
-        "mergedAt": pr.merged_at.isoformat() if pr.merged_at else None,
-    }
+    if run_async:
+        job_id = await repo.enqueue_job(
+            "bulk_create", {"pull_requests": items}, total=len(items)
+        )
+        return accepted(job_id)
+
+    results, created = await repo.bulk_create_prs(items)
+    return prevalidated({"results": bulk_results(results, created)})
 
 
 @router.post("/merge", response_model=schemas.PullRequest)
-async def merge_pr(payload: dict, db: AsyncSession = Depends(get_db)):
+async def merge_pr(payload: dict, repo: Repository = Depends(get_repository)):
     pr_id = payload.get("pull_request_id")
     if not pr_id:
         raise HTTPException(status_code=400, detail="pull_request_id required")
 
-    pr = await crud.merge_pr(db, pr_id)
+    pr = await repo.merge_pr(pr_id)
     if not pr:
         raise HTTPException(
             status_code=404,
             detail={"error": {"code": "NOT_FOUND", "message": "PR not found"}},
         )
 
-    pr = await get_pr_with_reviewers(db, pr.pull_request_id)
-    return schemas.PullRequest(
-        pull_request_id=pr.pull_request_id,
-        pull_request_name=pr.pull_request_name,
-        author_id=pr.author_id,
-        status=pr.status,
-        assigned_reviewers=[u.user_id for u in pr.assigned_reviewers],
-        createdAt=pr.created_at.isoformat() if pr.created_at else None,
-        mergedAt=pr.merged_at.isoformat() if pr.merged_at else None,
-    )
+    return prevalidated(pr_response(pr, pr.reviewers))
+
+
+def bulk_merge_results(results) -> list:
+    response = []
+    for pr_id, status, pr in results:
+        item = {"pull_request_id": pr_id, "status": status}
+        if pr is not None:
+            item["pr"] = pr_response(pr, pr.reviewers)
+        response.append(item)
+    return response
+
+
+@router.post("/bulkMerge")
+async def bulk_merge_prs(
+    payload: dict,
+    run_async: bool = Query(False, alias="async"),
+    repo: Repository = Depends(get_repository),
+):
+    pr_ids = payload.get("pull_request_ids")
+    if not isinstance(pr_ids, list) or not pr_ids:
+        raise HTTPException(
+            status_code=400, detail="pull_request_ids list required"
+        )
+    max_items = BULK_ASYNC_MAX_ITEMS if run_async else BULK_MAX_ITEMS
+    if len(pr_ids) > max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"at most {max_items} pull_request_ids per request",
+        )
+    if not all(isinstance(i, str) and i for i in pr_ids):
+        raise HTTPException(
+            status_code=400,
+            detail="pull_request_ids items must be non-empty strings",
+        )
+
+    if run_async:
+        job_id = await repo.enqueue_job(
+            "bulk_merge",
+            {"pull_request_ids": pr_ids},
+            total=len(set(pr_ids)),
+        )
+        return accepted(job_id)
+
+    results = await repo.bulk_merge_prs(pr_ids)
+    return prevalidated({"results": bulk_merge_results(results)})
 
 
 @router.post("/reassign")
-async def reassign_reviewer(payload: dict, db: AsyncSession = Depends(get_db)):
+async def reassign_reviewer(
+    payload: dict, repo: Repository = Depends(get_repository)
+):
     pr_id = payload.get("pull_request_id")
     old_user_id = payload.get("old_user_id") or payload.get("old_reviewer_id")
     if not pr_id or not old_user_id:
@@ -103,8 +215,8 @@ async def reassign_reviewer(payload: dict, db: AsyncSession = Depends(get_db)):
             status_code=400, detail="pull_request_id and old_user_id required"
         )
 
-    status, pr, new_reviewer = await crud.reassign_reviewer(
-        db, pr_id, old_user_id
+    status, pr, assigned, new_reviewer = await repo.reassign_reviewer(
+        pr_id, old_user_id
     )
     if status == "pr_not_found":
         raise HTTPException(
@@ -136,6 +248,16 @@ async def reassign_reviewer(payload: dict, db: AsyncSession = Depends(get_db)):
                 }
             },
         )
+    if status == "conflict":
+        raise HTTPException(
+            status_code=409,
+            detail={
+                "error": {
+                    "code": "CONCURRENT_UPDATE",
+                    "message": "PR was changed concurrently, retry",
+                }
+            },
+        )
     if status == "no_candidate":
         raise HTTPException(
             status_code=409,
@@ -147,16 +269,6 @@ async def reassign_reviewer(payload: dict, db: AsyncSession = Depends(get_db)):
             },
         )
 
-    pr = await get_pr_with_reviewers(db, pr.pull_request_id)
-    return {
-        "pr": schemas.PullRequest(
-            pull_request_id=pr.pull_request_id,
-            pull_request_name=pr.pull_request_name,
-            author_id=pr.author_id,
-            status=pr.status,
-            assigned_reviewers=[u.user_id for u in pr.assigned_reviewers],
-            createdAt=pr.created_at.isoformat() if pr.created_at else None,
-            mergedAt=pr.merged_at.isoformat() if pr.merged_at else None,
-        ),
-        "replaced_by": new_reviewer.user_id,
-    }
+    return prevalidated(
+        {"pr": pr_response(pr, assigned), "replaced_by": new_reviewer}
+    )
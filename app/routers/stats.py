@@ -1,40 +1,84 @@
-from fastapi import APIRouter, Depends
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from app.database import get_db
-from app import models
+from app.replica import get_read_db
+from app import metrics, rollups
+from app.responses import dumps
+from app.repository import Repository, get_read_repository, require_database
+from app.roster_cache import roster_cache
 
 router = APIRouter()
 
+STATS_MAX_LIMIT = 1000
+REVIEWS_MAX_DAYS = 366
+REVIEWS_DEFAULT_DAYS = 30
 
-@router.get("/stats")
-async def get_stats(db: AsyncSession = Depends(get_db)):
-    result_users = await db.execute(
-        select(models.User.user_id, func.count(models.pr_reviewers.c.pr_id))
-        .outerjoin(
-            models.pr_reviewers,
-            models.User.user_id == models.pr_reviewers.c.user_id,
-        )
-        .group_by(models.User.user_id)
+
+def etag_response(payload: dict, if_none_match: Optional[str]) -> Response:
+    # ETag считается по тем же байтам, что уходят клиенту
+    body = dumps(payload)
+    etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if if_none_match:
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(
+        content=body, media_type="application/json", headers=headers
     )
-    users_stats = {row.user_id: row[1] for row in result_users.all()}
 
-    result_prs = await db.execute(
-        select(
-            models.PullRequest.pull_request_id,
-            func.count(models.pr_reviewers.c.user_id),
-        )
-        .outerjoin(
-            models.pr_reviewers,
-            models.PullRequest.pull_request_id == models.pr_reviewers.c.pr_id,
+
+@router.get("/stats")
+async def get_stats(
+    limit: int = Query(100, ge=1, le=STATS_MAX_LIMIT),
+    offset: int = Query(0, ge=0),
+    top: Optional[int] = Query(None, ge=1, le=STATS_MAX_LIMIT),
+    if_none_match: Optional[str] = Header(None),
+    repo: Repository = Depends(get_read_repository),
+):
+    payload = await repo.stats(limit, offset, top)
+    return etag_response(payload, if_none_match)
+
+
+@router.get("/stats/reviews", dependencies=[Depends(require_database)])
+async def get_review_stats(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    team: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # из дневных агрегатов: стоимость зависит от длины окна, а не от
+    # числа PR
+    date_to = date_to or datetime.now(timezone.utc).date()
+    date_from = date_from or date_to - timedelta(days=REVIEWS_DEFAULT_DAYS - 1)
+    if date_from > date_to or (date_to - date_from).days >= REVIEWS_MAX_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error": {
+                    "code": "BAD_REQUEST",
+                    "message": f"from..to must be 1-{REVIEWS_MAX_DAYS} days",
+                }
+            },
         )
-        .group_by(models.PullRequest.pull_request_id)
-    )
-    prs_stats = {row.pull_request_id: row[1] for row in result_prs.all()}
+    payload = await rollups.review_stats(db, date_from, date_to, team)
+    return etag_response(payload, if_none_match)
 
-    return {"users": users_stats, "pull_requests": prs_stats}
+
+@router.get("/stats/cache")
+async def get_cache_stats():
+    return {"roster_cache": roster_cache.stats()}
 
 
 @router.get("/health")
 async def health():
     return {"status": "ok"}
+
+
+@router.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
@@ -1,70 +1,50 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
-from app.database import get_db
-from app import schemas, models
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app import schemas
+from app.repository import Repository, get_read_repository, get_repository
+from app.responses import accepted, prevalidated
 
 router = APIRouter()
 
 
-async def fetch_team(db: AsyncSession, team_name: str):
-    result = await db.execute(
-        select(models.Team)
-        .options(selectinload(models.Team.members))
-        .where(models.Team.team_name == team_name)
-    )
-    return result.scalar_one_or_none()
+def team_response(team_name: str, rows) -> dict:
+    return {
+        "team_name": team_name,
+        "members": [
+            {
+                "user_id": m.user_id,
+                "username": m.username,
+                "is_active": m.is_active,
+            }
+            for m in rows
+        ],
+    }
 
 
 @router.post("/add", response_model=schemas.Team, status_code=201)
-async def add_team(team: schemas.Team, db: AsyncSession = Depends(get_db)):
-    existing_team = await db.execute(
-        select(models.Team).where(models.Team.team_name == team.team_name)
-    )
-    team_obj = existing_team.scalar_one_or_none()
-
-    if not team_obj:
-        team_obj = models.Team(team_name=team.team_name)
-        db.add(team_obj)
-
-    for member in team.members:
-        existing_user = await db.get(models.User, member.user_id)
-        if existing_user:
-            existing_user.team_name = team.team_name
-            existing_user.username = member.username
-            existing_user.is_active = member.is_active
-        else:
-            new_user = models.User(
-                user_id=member.user_id,
-                username=member.username,
-                is_active=member.is_active,
-                team=team_obj,
-            )
-            db.add(new_user)
-
-    await db.commit()
-    await db.refresh(team_obj)
-    return schemas.Team(
-        team_name=team_obj.team_name,
-        members=[
-            schemas.TeamMember(
-                user_id=m.user_id, username=m.username, is_active=m.is_active
-            )
-            for m in team_obj.members
-        ],
-    )
+async def add_team(
+    team: schemas.Team,
+    run_async: bool = Query(False, alias="async"),
+    repo: Repository = Depends(get_repository),
+):
+    members = [m.model_dump() for m in team.members]
+    if run_async:
+        job_id = await repo.enqueue_job(
+            "team_import",
+            {"team_name": team.team_name, "members": members},
+            total=len(members),
+        )
+        return accepted(job_id)
+
+    rows = await repo.upsert_team(team.team_name, members)
+    return schemas.Team(**team_response(team.team_name, rows))
 
 
 @router.get("/get", response_model=schemas.Team)
-async def get_team(team_name: str, db: AsyncSession = Depends(get_db)):
-    result = await db.execute(
-        select(models.Team)
-        .options(selectinload(models.Team.members))
-        .where(models.Team.team_name == team_name)
-    )
-    team_obj = result.scalar_one_or_none()
-    if not team_obj:
+async def get_team(
+    team_name: str, repo: Repository = Depends(get_read_repository)
+):
+    members = await repo.get_team(team_name)
+    if members is None:
         raise HTTPException(
             status_code=404,
             detail={
@@ -72,45 +52,44 @@ async def get_team(team_name: str, db: AsyncSession = Depends(get_db)):
             },
         )
 
-    return schemas.Team(
-        team_name=team_obj.team_name,
-        members=[
-            schemas.TeamMember(
-                user_id=m.user_id, username=m.username, is_active=m.is_active
-            )
-            for m in team_obj.members
-        ],
-    )
+    return prevalidated(team_response(team_name, members))
 
 
 @router.post("/team/deactivate")
 async def deactivate_team_users(
-    team_name: str, db: AsyncSession = Depends(get_db)
+    team_name: str,
+    run_async: bool = Query(False, alias="async"),
+    repo: Repository = Depends(get_repository),
 ):
-    result = await db.execute(
-        select(models.Team)
-        .where(models.Team.team_name == team_name)
-        .options(selectinload(models.Team.members))
-    )
-    team = result.scalar_one_or_none()
-    if not team:
+    if run_async:
+        # несуществующая команда — 404 сразу, а не проваленная задача
+        if not await repo.team_exists(team_name):
+            raise HTTPException(status_code=404, detail="Team not found")
+        job_id = await repo.enqueue_job(
+            "deactivate_team", {"team_name": team_name}
+        )
+        return accepted(job_id)
+
+    result = await repo.deactivate_team(team_name)
+    if result is None:
         raise HTTPException(status_code=404, detail="Team not found")
 
-    for user in team.members:
-        user.is_active = False
+    return {"status": "OK", **result}
 
-    open_prs = await db.execute(
-        select(models.PullRequest)
-        .where(models.PullRequest.status == "OPEN")
-        .options(selectinload(models.PullRequest.assigned_reviewers))
-    )
-    for pr in open_prs.scalars():
-        pr.assigned_reviewers = [
-            u for u in pr.assigned_reviewers if u.is_active
-        ]
 
-    await db.commit()
-    return {
-        "status": "OK",
-        "deactivated_users": [u.user_id for u in team.members],
-    }
+@router.post("/rebalance")
+async def rebalance_team(
+    team_name: str,
+    dry_run: bool = False,
+    repo: Repository = Depends(get_repository),
+):
+    result = await repo.rebalance_team(team_name, dry_run)
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail={
+                "error": {"code": "NOT_FOUND", "message": "resource not found"}
+            },
+        )
+
+    return {"status": "OK", "team_name": team_name, "dry_run": dry_run, **result}
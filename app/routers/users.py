@@ -1,14 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app import crud, schemas
-from sqlalchemy import text
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from app import events, schemas, models
+from app.repository import Repository, get_read_repository, get_repository
+from app.responses import dumps
 
 router = APIRouter()
 
+REVIEWS_MAX_LIMIT = 1000
+
+
+def encode_cursor(created_at: datetime, pr_id: str) -> str:
+    raw = json.dumps([created_at.isoformat(), pr_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, pr_id = json.loads(base64.urlsafe_b64decode(cursor))
+        return datetime.fromisoformat(created_at), str(pr_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("invalid cursor") from e
+
 
 @router.post("/setIsActive", response_model=schemas.User)
-async def set_is_active(payload: dict, db: AsyncSession = Depends(get_db)):
+async def set_is_active(
+    payload: dict, repo: Repository = Depends(get_repository)
+):
     user_id = payload.get("user_id")
     is_active = payload.get("is_active")
     if user_id is None or is_active is None:
@@ -16,7 +38,7 @@ async def set_is_active(payload: dict, db: AsyncSession = Depends(get_db)):
             status_code=400, detail="user_id and is_active required"
         )
 
-    user = await crud.set_user_active(db, user_id, is_active)
+    user = await repo.set_user_active(user_id, is_active)
     if not user:
         raise HTTPException(
             status_code=404,
@@ -33,27 +55,82 @@ async def set_is_active(payload: dict, db: AsyncSession = Depends(get_db)):
     )
 
 
+async def stream_user_reviews(repo, user_id, status, limit, after):
+    yield b'{"user_id":%s,"pull_requests":[' % dumps(user_id)
+
+    count = 0
+    last = None
+    next_cursor = None
+    rows = repo.iter_reviews(user_id, status, after, limit + 1)
+    try:
+        async for row in rows:
+            # лишняя (limit + 1)-я строка означает, что есть следующая страница
+            if count == limit:
+                next_cursor = encode_cursor(
+                    last.created_at, last.pull_request_id
+                )
+                break
+            # строки хранилища уже соответствуют schemas.PullRequestShort
+            item = dumps(
+                {
+                    "pull_request_id": row.pull_request_id,
+                    "pull_request_name": row.pull_request_name,
+                    "author_id": row.author_id,
+                    "status": row.status.value,
+                }
+            )
+            yield (b"," if count else b"") + item
+            count += 1
+            last = row
+    finally:
+        await rows.aclose()
+
+    yield b'],"next_cursor":%s}' % dumps(next_cursor)
+
+
 @router.get("/getReview")
-async def get_user_reviews(user_id: str, db: AsyncSession = Depends(get_db)):
-    stmt = text(
-        """
-        SELECT pr.pull_request_id, pr.pull_request_name, pr.author_id, pr.status
-        FROM pull_requests pr
-        JOIN pr_reviewers r ON pr.pull_request_id = r.pr_id
-        WHERE r.user_id = :uid
-    """
-    )
-    result = await db.execute(stmt, {"uid": user_id})
-    prs = result.all()
-    return {
-        "user_id": user_id,
-        "pull_requests": [
-            schemas.PullRequestShort(
-                pull_request_id=p.pull_request_id,
-                pull_request_name=p.pull_request_name,
-                author_id=p.author_id,
-                status=p.status,
+async def get_user_reviews(
+    user_id: str,
+    status: Optional[schemas.PRStatus] = None,
+    limit: int = Query(100, ge=1, le=REVIEWS_MAX_LIMIT),
+    cursor: Optional[str] = None,
+    repo: Repository = Depends(get_read_repository),
+):
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(
+                status_code=400,
+                detail={
+                    "error": {
+                        "code": "INVALID_CURSOR",
+                        "message": "cursor is malformed",
+                    }
+                },
             )
-            for p in prs
-        ],
-    }
+
+    # ответ отдаётся построчно из серверного курсора, без сборки списка
+    return StreamingResponse(
+        stream_user_reviews(
+            repo,
+            user_id,
+            models.PRStatus(status.value) if status else None,
+            limit,
+            after,
+        ),
+        media_type="application/json",
+    )
+
+
+@router.get("/{user_id}/events")
+async def user_events(
+    user_id: str, broker: events.Broker = Depends(events.get_event_broker)
+):
+    # SSE вместо опроса getReview: назначения, снятия и merge его PR
+    return StreamingResponse(
+        events.event_stream(broker, user_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
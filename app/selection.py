@@ -0,0 +1,45 @@
+import heapq
+import random
+
+from app import config
+
+
+class RandomStrategy:
+    name = "random"
+    uses_load = False
+
+    def pick(self, candidates, k, load=None, rng=random):
+        return rng.sample(candidates, k=min(k, len(candidates)))
+
+
+class LeastLoadedStrategy:
+    """Наименее загруженные по числу открытых ревью.
+
+    Кандидаты перемешиваются заранее, а nsmallest устойчив, поэтому среди
+    равных по нагрузке выбор случайный.
+    """
+
+    name = "least_loaded"
+    uses_load = True
+
+    def pick(self, candidates, k, load=None, rng=random):
+        load = load or {}
+        shuffled = list(candidates)
+        rng.shuffle(shuffled)
+        return heapq.nsmallest(k, shuffled, key=lambda u: load.get(u, 0))
+
+
+STRATEGIES = {
+    s.name: s for s in (RandomStrategy(), LeastLoadedStrategy())
+}
+
+
+def get_strategy(name: str = None):
+    name = name or config.REVIEWER_STRATEGY
+    try:
+        return STRATEGIES[name]
+    except KeyError:
+        raise ValueError(
+            f"unknown reviewer strategy {name!r}, "
+            f"expected one of {sorted(STRATEGIES)}"
+        )
@@ -0,0 +1,493 @@
+"""Офлайн-прогон истории PR через стратегии выбора ревьюеров.
+
+    python -m app.simulate synthetic --teams 100 --users 10 --prs 1000000
+    python -m app.simulate replay pull_requests.ndjson [--teams-file teams.json]
+
+История — выгрузка GET /export/pullRequests (NDJSON или CSV) или
+синтетическая. Каждый PR заново назначается по правилам crud.create_pr
+(2 активных участника команды автора, кроме автора), при переназначении —
+по правилам crud.reassign_reviewer (замена из команды прежнего ревьюера),
+merge снимает PR с очереди. Стратегии — app.selection.STRATEGIES, так что
+новые стратегии участвуют без изменений здесь.
+
+Назначения идут последовательно (выбор зависит от текущей нагрузки), а
+длины очередей по ревьюерам во времени и метрики справедливости (Gini,
+max/mean) считаются векторно в NumPy. Последовательная часть — по вызову
+pick на событие: ~110 тыс. PR/с для random, ~60 тыс. PR/с для
+least_loaded.
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+import orjson
+
+from app.selection import STRATEGIES, get_strategy
+
+OPEN, REASSIGN, MERGE = 0, 1, 2
+REVIEWERS_PER_PR = 2
+
+
+@dataclass
+class History:
+    user_ids: list
+    # по пользователю: индекс команды и активность
+    team_of: np.ndarray
+    active: np.ndarray
+    # по PR: автор, время создания и merge (nan — открыт), переназначение
+    author: np.ndarray
+    created: np.ndarray
+    merged: np.ndarray
+    reassign_at: np.ndarray
+
+
+@dataclass
+class Run:
+    strategy: str
+    seconds: float
+    assignments: np.ndarray
+    # длина очереди открытых ревью: ревьюер x момент samples
+    queue: np.ndarray
+    samples: np.ndarray
+    unassigned: int
+    reassigns: int
+
+
+# --- история ---
+def synthetic_history(
+    teams: int,
+    users_per_team: int,
+    prs: int,
+    days: float = 90.0,
+    inactive_ratio: float = 0.05,
+    open_ratio: float = 0.05,
+    reassign_rate: float = 0.05,
+    median_hours: float = 6.0,
+    seed: int = 0,
+) -> History:
+    rng = np.random.default_rng(seed)
+    users = teams * users_per_team
+    team_of = np.repeat(np.arange(teams), users_per_team)
+    active = rng.random(users) >= inactive_ratio
+    # у авторов разная активность: вес ~ lognormal
+    weights = rng.lognormal(0.0, 0.75, users)
+    author = rng.choice(users, size=prs, p=weights / weights.sum())
+    created = np.sort(rng.uniform(0.0, days * 86400.0, prs))
+    review = rng.lognormal(np.log(median_hours * 3600.0), 1.0, prs)
+    merged = created + review
+    merged[rng.random(prs) < open_ratio] = np.nan
+    end = np.where(np.isnan(merged), days * 86400.0, merged)
+    reassign_at = np.full(prs, np.nan)
+    reassigned = rng.random(prs) < reassign_rate
+    reassign_at[reassigned] = rng.uniform(created, end)[reassigned]
+    return History(
+        user_ids=[f"t{t}-u{u}" for t in range(teams) for u in range(users_per_team)],
+        team_of=team_of,
+        active=active,
+        author=author,
+        created=created,
+        merged=merged,
+        reassign_at=reassign_at,
+    )
+
+
+def _timestamp(value) -> float:
+    if not value:
+        return np.nan
+    return datetime.fromisoformat(value).timestamp()
+
+
+def _read_export(path: str):
+    """(author_id, created_at, merged_at, reviewers) из выгрузки."""
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            for row in csv.DictReader(f):
+                reviewers = row["reviewers"].split(";") if row["reviewers"] else []
+                yield row["author_id"], row["created_at"], row["merged_at"], reviewers
+            return
+        for line in f:
+            if line.strip():
+                row = orjson.loads(line)
+                yield (
+                    row["author_id"],
+                    row["created_at"],
+                    row["merged_at"],
+                    row["reviewers"],
+                )
+
+
+def _read_teams(path: str) -> dict:
+    """{team_name: [(user_id, is_active)]} из {"team": ["u1", ...]} или
+    списка ответов GET /team/get."""
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        return {team: [(u, True) for u in users] for team, users in data.items()}
+    return {
+        team["team_name"]: [
+            (m["user_id"], m.get("is_active", True)) for m in team["members"]
+        ]
+        for team in data
+    }
+
+
+def load_history(
+    path: str,
+    teams_path: Optional[str] = None,
+    reassign_rate: float = 0.0,
+    seed: int = 0,
+) -> History:
+    """История из выгрузки. Без teams_path команды восстанавливаются как
+    связные компоненты «автор — его ревьюеры»: прежние назначения шли из
+    команды автора. Авторы вне известных команд получают PR без ревьюеров."""
+    index = {}
+    authors, created, merged, pairs = [], [], [], []
+    for author_id, created_at, merged_at, reviewers in _read_export(path):
+        a = index.setdefault(author_id, len(index))
+        authors.append(a)
+        created.append(_timestamp(created_at))
+        merged.append(_timestamp(merged_at))
+        if teams_path is None:
+            pairs.extend((a, index.setdefault(r, len(index))) for r in reviewers)
+
+    team_of = []
+    active = []
+    if teams_path is not None:
+        members = {}
+        for t, (_, users) in enumerate(sorted(_read_teams(teams_path).items())):
+            for user_id, is_active in users:
+                members[user_id] = (t, is_active)
+        for user_id in members:
+            index.setdefault(user_id, len(index))
+        # пользователи без команды — каждый в своей, без кандидатов
+        lone = len(members)
+        for user_id in index:
+            t, is_active = members.get(user_id, (lone, False))
+            if user_id not in members:
+                lone += 1
+            team_of.append(t)
+            active.append(is_active)
+    else:
+        parent = list(range(len(index)))
+
+        def find(u):
+            while parent[u] != u:
+                parent[u] = parent[parent[u]]
+                u = parent[u]
+            return u
+
+        for a, r in pairs:
+            ra, rr = find(a), find(r)
+            if ra != rr:
+                parent[ra] = rr
+        team_of = [find(u) for u in range(len(index))]
+        active = [True] * len(index)
+
+    created = np.array(created)
+    merged = np.array(merged)
+    reassign_at = np.full(len(created), np.nan)
+    if reassign_rate:
+        rng = np.random.default_rng(seed)
+        end = np.where(np.isnan(merged), np.nanmax(created), merged)
+        reassigned = rng.random(len(created)) < reassign_rate
+        reassign_at[reassigned] = rng.uniform(created, end)[reassigned]
+    user_ids = list(index)
+    return History(
+        user_ids=user_ids,
+        team_of=np.array(team_of, dtype=np.int64),
+        active=np.array(active, dtype=bool),
+        author=np.array(authors, dtype=np.int64),
+        created=created,
+        merged=merged,
+        reassign_at=reassign_at,
+    )
+
+
+# --- прогон ---
+def simulate(
+    history: History, strategy_name: str, samples: int = 1000, seed: int = 0
+) -> Run:
+    strategy = get_strategy(strategy_name)
+    rng = random.Random(seed)
+    started = time.perf_counter()
+
+    users = len(history.user_ids)
+    team_active = {}
+    for u in np.flatnonzero(history.active).tolist():
+        team_active.setdefault(int(history.team_of[u]), []).append(u)
+    team_of = history.team_of.tolist()
+    # кандидаты create_pr: активные из команды автора, кроме автора
+    candidates_of = {}
+    for a in np.unique(history.author).tolist():
+        candidates_of[a] = [
+            u for u in team_active.get(team_of[a], ()) if u != a
+        ]
+
+    # события по времени; при равенстве — создание раньше merge
+    prs = len(history.author)
+    reassigned = np.flatnonzero(~np.isnan(history.reassign_at))
+    merged = np.flatnonzero(~np.isnan(history.merged))
+    times = np.concatenate(
+        [history.created, history.reassign_at[reassigned], history.merged[merged]]
+    )
+    kinds = np.concatenate(
+        [
+            np.full(prs, OPEN),
+            np.full(len(reassigned), REASSIGN),
+            np.full(len(merged), MERGE),
+        ]
+    )
+    targets = np.concatenate([np.arange(prs), reassigned, merged])
+    order = np.lexsort((kinds, times))
+    horizon = float(times.max()) if len(times) else 0.0
+
+    load = {}
+    pick = strategy.pick
+    author = history.author.tolist()
+    # интервалы назначений: ревьюер, начало, конец (inf — открыт до конца)
+    rec_user, rec_start, rec_end = [], [], []
+    current = [None] * prs
+    unassigned = 0
+    reassigns = 0
+    for t, kind, p in zip(
+        times[order].tolist(), kinds[order].tolist(), targets[order].tolist()
+    ):
+        if kind == OPEN:
+            picked = pick(candidates_of[author[p]], REVIEWERS_PER_PR, load, rng)
+            if len(picked) < REVIEWERS_PER_PR:
+                unassigned += 1
+            recs = []
+            for u in picked:
+                load[u] = load.get(u, 0) + 1
+                recs.append(len(rec_user))
+                rec_user.append(u)
+                rec_start.append(t)
+                rec_end.append(np.inf)
+            current[p] = recs
+        elif kind == MERGE:
+            for r in current[p]:
+                u = rec_user[r]
+                load[u] -= 1
+                rec_end[r] = t
+        else:
+            recs = current[p]
+            if not recs or t >= rec_end[recs[0]]:
+                continue
+            # история не знает, кого заменяли: случайный из текущих
+            slot = rng.randrange(len(recs))
+            old = rec_user[recs[slot]]
+            taken = {rec_user[r] for r in recs}
+            a = author[p]
+            candidates = [
+                u
+                for u in team_active.get(team_of[old], ())
+                if u not in taken and u != a
+            ]
+            if not candidates:
+                continue
+            new = pick(candidates, 1, load, rng)[0]
+            load[old] -= 1
+            load[new] = load.get(new, 0) + 1
+            rec_end[recs[slot]] = t
+            recs[slot] = len(rec_user)
+            rec_user.append(new)
+            rec_start.append(t)
+            rec_end.append(np.inf)
+            reassigns += 1
+
+    rec_user = np.array(rec_user, dtype=np.int64)
+    grid = np.linspace(float(times.min()) if len(times) else 0.0, horizon, samples)
+    return Run(
+        strategy=strategy_name,
+        seconds=time.perf_counter() - started,
+        assignments=np.bincount(rec_user, minlength=users),
+        queue=queue_lengths(
+            rec_user, np.array(rec_start), np.array(rec_end), grid, users
+        ),
+        samples=grid,
+        unassigned=unassigned,
+        reassigns=reassigns,
+    )
+
+
+def queue_lengths(user, start, end, grid, users: int) -> np.ndarray:
+    """Открытые ревью каждого пользователя в моменты grid: интервал
+    [start, end) учитывается в точках, которые он покрывает."""
+    width = len(grid) + 1
+    first = np.searchsorted(grid, start, side="left")
+    stop = np.searchsorted(grid, end, side="left")
+    size = users * width
+    delta = np.bincount(user * width + first, minlength=size) - np.bincount(
+        user * width + stop, minlength=size
+    )
+    return np.cumsum(delta.reshape(users, width), axis=1)[:, :-1]
+
+
+# --- метрики ---
+def gini(values: np.ndarray, axis: int = 0) -> np.ndarray:
+    """Коэффициент Джини вдоль axis (0 — равенство, →1 — всё у одного)."""
+    x = np.sort(np.asarray(values, dtype=float), axis=axis)
+    n = x.shape[axis]
+    shape = [1] * x.ndim
+    shape[axis] = n
+    rank = np.arange(1, n + 1).reshape(shape)
+    total = x.sum(axis=axis)
+    weighted = (rank * x).sum(axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = 2 * weighted / (n * total) - (n + 1) / n
+    return np.where(total > 0, result, 0.0)
+
+
+def max_mean(values: np.ndarray, axis: int = 0) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    mean = values.mean(axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(mean > 0, values.max(axis=axis) / mean, 0.0)
+
+
+def fairness(run: Run, eligible: np.ndarray) -> dict:
+    """Метрики по ревьюерам eligible (активным участникам команд)."""
+    assignments = run.assignments[eligible]
+    queue = run.queue[eligible]
+    mean_queue = queue.mean(axis=1)
+    return {
+        "strategy": run.strategy,
+        "seconds": round(run.seconds, 3),
+        "reviewers": int(eligible.sum()),
+        "assignments": int(assignments.sum()),
+        "unassigned_prs": run.unassigned,
+        "reassigns": run.reassigns,
+        "assignments_gini": round(float(gini(assignments)), 4),
+        "assignments_max_mean": round(float(max_mean(assignments)), 3),
+        "queue_mean": round(float(queue.mean()), 3),
+        "queue_p99": float(np.percentile(queue, 99)),
+        "queue_peak": int(queue.max()),
+        "mean_queue_gini": round(float(gini(mean_queue)), 4),
+        "mean_queue_max_mean": round(float(max_mean(mean_queue)), 3),
+        # по каждому моменту отдельно, затем среднее по времени
+        "queue_gini_over_time": round(float(gini(queue, axis=0).mean()), 4),
+        "queue_max_mean_over_time": round(
+            float(max_mean(queue, axis=0).mean()), 3
+        ),
+    }
+
+
+def compare(
+    history: History, strategies, samples: int = 1000, seed: int = 0
+):
+    """Прогоны по стратегиям и их отчёты; кандидатами считаются только
+    активные пользователи."""
+    eligible = history.active.copy()
+    runs = [simulate(history, name, samples, seed) for name in strategies]
+    return runs, [fairness(run, eligible) for run in runs]
+
+
+COLUMNS = (
+    "strategy",
+    "seconds",
+    "assignments_gini",
+    "assignments_max_mean",
+    "queue_mean",
+    "queue_p99",
+    "queue_peak",
+    "mean_queue_gini",
+    "queue_gini_over_time",
+    "queue_max_mean_over_time",
+)
+
+
+def print_table(reports: list, out=sys.stdout):
+    widths = [max(len(c), 10) for c in COLUMNS]
+    print("  ".join(c.rjust(w) for c, w in zip(COLUMNS, widths)), file=out)
+    for report in reports:
+        print(
+            "  ".join(str(report[c]).rjust(w) for c, w in zip(COLUMNS, widths)),
+            file=out,
+        )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.simulate")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    synthetic = commands.add_parser("synthetic", help="generate a history")
+    synthetic.add_argument("--teams", type=int, default=100)
+    synthetic.add_argument("--users", type=int, default=10, help="per team")
+    synthetic.add_argument("--prs", type=int, default=100000)
+    synthetic.add_argument("--days", type=float, default=90.0)
+    synthetic.add_argument("--inactive-ratio", type=float, default=0.05)
+    synthetic.add_argument("--open-ratio", type=float, default=0.05)
+    synthetic.add_argument("--median-hours", type=float, default=6.0)
+
+    replay = commands.add_parser("replay", help="replay an exported history")
+    replay.add_argument("path", help="GET /export/pullRequests output")
+    replay.add_argument(
+        "--teams-file", default=None, help="JSON {team: [user_id, ...]}"
+    )
+
+    for command in (synthetic, replay):
+        command.add_argument(
+            "--reassign-rate",
+            type=float,
+            default=0.05 if command is synthetic else 0.0,
+        )
+        command.add_argument(
+            "--strategies",
+            default=",".join(STRATEGIES),
+            help="comma separated",
+        )
+        command.add_argument("--samples", type=int, default=1000)
+        command.add_argument("--seed", type=int, default=0)
+        command.add_argument("--out", default=None, help="JSON report")
+        command.add_argument(
+            "--series", default=None, help="queue series, .npz"
+        )
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    if args.command == "synthetic":
+        history = synthetic_history(
+            args.teams,
+            args.users,
+            args.prs,
+            days=args.days,
+            inactive_ratio=args.inactive_ratio,
+            open_ratio=args.open_ratio,
+            reassign_rate=args.reassign_rate,
+            median_hours=args.median_hours,
+            seed=args.seed,
+        )
+    else:
+        history = load_history(
+            args.path, args.teams_file, args.reassign_rate, args.seed
+        )
+    print(
+        f"history: {len(history.author)} PRs, {len(history.user_ids)} users "
+        f"({time.perf_counter() - started:.2f}s)"
+    )
+
+    runs, reports = compare(
+        history, args.strategies.split(","), args.samples, args.seed
+    )
+    print_table(reports)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(reports, f, indent=2)
+    if args.series:
+        np.savez_compressed(
+            args.series,
+            user_ids=np.array(history.user_ids),
+            samples=runs[0].samples,
+            **{f"queue_{run.strategy}": run.queue for run in runs},
+        )
+
+
+if __name__ == "__main__":
+    main()
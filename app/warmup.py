@@ -0,0 +1,44 @@
+import asyncio
+import logging
+
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app import config, crud
+from app.database import engine as default_engine
+
+logger = logging.getLogger(__name__)
+
+
+async def _prepare(connection):
+    async with AsyncSession(bind=connection) as session:
+        await crud.warm_up(session)
+        await session.rollback()
+
+
+async def warm_up(engine: AsyncEngine = None, connections: int = None):
+    """Открывает минимальный пул и готовит горячие запросы.
+
+    Все соединения берутся из пула одновременно, иначе пул вернул бы одно и
+    то же соединение и остальные открылись бы уже под первыми запросами.
+    """
+    engine = engine or default_engine
+    connections = connections or config.DB_POOL_SIZE
+    opened = await asyncio.gather(
+        *(engine.connect() for _ in range(connections)),
+        return_exceptions=True,
+    )
+    ready = [c for c in opened if not isinstance(c, BaseException)]
+    try:
+        await asyncio.gather(*(_prepare(c) for c in ready))
+    finally:
+        await asyncio.gather(*(c.close() for c in ready))
+
+    failed = len(opened) - len(ready)
+    if failed:
+        logger.warning(
+            "warm-up: %d of %d connections failed: %s",
+            failed,
+            connections,
+            next(c for c in opened if isinstance(c, BaseException)),
+        )
+    return len(ready)
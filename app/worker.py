@@ -0,0 +1,184 @@
+"""Воркер фоновых задач.
+
+    python -m app.worker [--once] [--poll-interval 1.0]
+
+По умолчанию тот же воркер запускается и внутри приложения
+(JOB_WORKER_IN_APP=1); отдельные процессы можно добавлять сколько угодно —
+задачи между ними делит FOR UPDATE SKIP LOCKED.
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from app import config, crud, jobs, metrics
+from app.database import AsyncSessionLocal, engine
+from app.routers.pull_requests import bulk_merge_results, bulk_results
+from app.routers.teams import team_response
+
+logger = logging.getLogger(__name__)
+
+
+def batches(items: list, size: int):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+async def run_team_import(session_factory, job, payload):
+    # повторы user_id: побеждает последний, как в синхронном /team/add
+    members = list({m["user_id"]: m for m in payload["members"]}.values())
+    team_name = payload["team_name"]
+    done = 0
+    # пустой состав: команда всё равно создаётся, как в /team/add
+    for batch in list(batches(members, config.JOB_BATCH_SIZE)) or [[]]:
+        # upsert возвращает весь состав команды: последний ответ — итог
+        async with session_factory() as db:
+            rows = await crud.upsert_team(db, team_name, batch)
+        done += len(batch)
+        await jobs.set_progress(session_factory, job, done)
+    return team_response(team_name, rows)
+
+
+async def run_bulk_create(session_factory, job, payload):
+    items = payload["pull_requests"]
+    response = []
+    for batch in batches(items, config.JOB_BATCH_SIZE):
+        async with session_factory() as db:
+            results, created = await crud.bulk_create_prs(db, batch)
+        response.extend(bulk_results(results, created))
+        await jobs.set_progress(session_factory, job, len(response))
+    return {"results": response}
+
+
+async def run_bulk_merge(session_factory, job, payload):
+    pr_ids = list(dict.fromkeys(payload["pull_request_ids"]))
+    response = []
+    for batch in batches(pr_ids, config.JOB_BATCH_SIZE):
+        async with session_factory() as db:
+            results = await crud.bulk_merge_prs(db, batch)
+        response.extend(bulk_merge_results(results))
+        await jobs.set_progress(session_factory, job, len(response))
+    return {"results": response}
+
+
+async def run_deactivate_team(session_factory, job, payload):
+    async def on_progress(affected):
+        await jobs.set_progress(session_factory, job, affected)
+
+    async with session_factory() as db:
+        result = await crud.deactivate_team(
+            db, payload["team_name"], on_progress=on_progress
+        )
+    if result is None:
+        # команда удалена между постановкой задачи и запуском
+        raise jobs.PermanentJobError("team not found")
+    return {"status": "OK", **result}
+
+
+HANDLERS = {
+    "team_import": run_team_import,
+    "bulk_create": run_bulk_create,
+    "bulk_merge": run_bulk_merge,
+    "deactivate_team": run_deactivate_team,
+}
+
+
+class Worker:
+    def __init__(self, session_factory, poll_interval: float = None):
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval or config.JOB_POLL_INTERVAL
+
+    async def _heartbeat(self, job):
+        # heartbeat по таймеру: долгий шаг без прогресса не делает задачу
+        # брошенной
+        while True:
+            await asyncio.sleep(config.JOB_HEARTBEAT_INTERVAL)
+            try:
+                if not await jobs.heartbeat(self.session_factory, job):
+                    return  # задачу забрал другой воркер
+            except Exception:
+                logger.exception("job %s heartbeat failed", job.job_id)
+
+    async def run_once(self) -> bool:
+        """Выполняет одну задачу; False — очередь пуста."""
+        job = await jobs.claim(self.session_factory)
+        if job is None:
+            return False
+        handler = HANDLERS.get(job.kind)
+        beat = asyncio.create_task(self._heartbeat(job))
+        try:
+            if handler is None:
+                raise jobs.PermanentJobError(f"unknown job kind {job.kind!r}")
+            result = await handler(self.session_factory, job, job.payload)
+        except Exception as e:
+            logger.exception("job %s (%s) failed", job.job_id, job.kind)
+            retry = (
+                not isinstance(e, jobs.PermanentJobError)
+                and job.attempts < config.JOB_MAX_ATTEMPTS
+            )
+            await jobs.fail(
+                self.session_factory,
+                job,
+                f"{type(e).__name__}: {e}",
+                retry,
+            )
+            outcome = "retried" if retry else jobs.FAILED
+            metrics.JOBS.labels(job.kind, outcome).inc()
+            return True
+        finally:
+            beat.cancel()
+        await jobs.succeed(self.session_factory, job, result)
+        metrics.JOBS.labels(job.kind, jobs.SUCCEEDED).inc()
+        return True
+
+    async def drain(self) -> int:
+        """Выполняет задачи, пока очередь не опустеет."""
+        done = 0
+        while await self.run_once():
+            done += 1
+        return done
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            try:
+                if await self.run_once():
+                    continue
+            except Exception:
+                # БД недоступна и т.п. — подождать и попробовать снова
+                logger.exception("job worker iteration failed")
+            try:
+                await asyncio.wait_for(stop.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def main_async(once: bool, poll_interval: float):
+    worker = Worker(AsyncSessionLocal, poll_interval)
+    try:
+        if once:
+            logger.info("processed %d jobs", await worker.drain())
+            return
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await worker.run(stop)
+    finally:
+        await engine.dispose()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app.worker")
+    parser.add_argument(
+        "--once", action="store_true", help="drain the queue and exit"
+    )
+    parser.add_argument(
+        "--poll-interval", type=float, default=config.JOB_POLL_INTERVAL
+    )
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main_async(args.once, args.poll_interval))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models import Base
+
+
+@dataclass
+class Org:
+    teams: list = field(default_factory=list)
+    users: list = field(default_factory=list)
+    prs: list = field(default_factory=list)
+    reviewers: list = field(default_factory=list)
+
+    def members(self, team_name):
+        return [u[0] for u in self.users if u[2] == team_name]
+
+    def open_prs(self):
+        reviewers = {}
+        for pr_id, user_id in self.reviewers:
+            reviewers.setdefault(pr_id, []).append(user_id)
+        return {
+            pr[0]: reviewers.get(pr[0], [])
+            for pr in self.prs
+            if pr[3] == "OPEN"
+        }
+
+
+def generate_org(
+    teams: int,
+    users_per_team: int,
+    prs: int,
+    open_ratio: float = 0.2,
+    inactive_ratio: float = 0.05,
+    seed: int = 0,
+) -> Org:
+    rng = random.Random(seed)
+    org = Org()
+    for t in range(teams):
+        team_name = f"bt-{t}"
+        org.teams.append((team_name,))
+        for u in range(users_per_team):
+            org.users.append(
+                (
+                    f"bu-{t}-{u}",
+                    f"user {t}-{u}",
+                    team_name,
+                    rng.random() >= inactive_ratio,
+                )
+            )
+
+    by_team = {}
+    for user_id, _, team_name, is_active in org.users:
+        by_team.setdefault(team_name, []).append((user_id, is_active))
+
+    start = datetime.now(timezone.utc) - timedelta(minutes=prs)
+    for p in range(prs):
+        team_name = org.teams[rng.randrange(teams)][0]
+        members = by_team[team_name]
+        author_id = rng.choice(members)[0]
+        candidates = [u for u, active in members if active and u != author_id]
+        assigned = rng.sample(candidates, k=min(2, len(candidates)))
+        created_at = start + timedelta(minutes=p)
+        is_open = rng.random() < open_ratio
+        merged_at = (
+            None
+            if is_open
+            else created_at + timedelta(minutes=rng.randint(5, 5000))
+        )
+        pr_id = f"bpr-{p}"
+        org.prs.append(
+            (
+                pr_id,
+                f"PR {p}",
+                author_id,
+                "OPEN" if is_open else "MERGED",
+                created_at,
+                merged_at,
+                len(assigned),
+            )
+        )
+        org.reviewers.extend((pr_id, u) for u in assigned)
+    return org
+
+
+async def load_org(engine: AsyncEngine, org: Org, reset: bool = True):
+    """Загружает организацию через COPY; reset пересоздаёт все таблицы."""
+    async with engine.begin() as conn:
+        if reset:
+            await conn.run_sync(Base.metadata.drop_all)
+            await conn.run_sync(Base.metadata.create_all)
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        await driver.copy_records_to_table(
+            "teams", records=org.teams, columns=["team_name"]
+        )
+        await driver.copy_records_to_table(
+            "users",
+            records=org.users,
+            columns=["user_id", "username", "team_name", "is_active"],
+        )
+        await driver.copy_records_to_table(
+            "pull_requests",
+            records=org.prs,
+            columns=[
+                "pull_request_id",
+                "pull_request_name",
+                "author_id",
+                "status",
+                "created_at",
+                "merged_at",
+                "reviewers_count",
+            ],
+        )
+        await driver.copy_records_to_table(
+            "pr_reviewers", records=org.reviewers, columns=["pr_id", "user_id"]
+        )
+
+        status = {pr[0]: pr[3] for pr in org.prs}
+        assigned = Counter(u for _, u in org.reviewers)
+        open_reviews = Counter(
+            u for pr_id, u in org.reviewers if status[pr_id] == "OPEN"
+        )
+        await driver.copy_records_to_table(
+            "reviewer_stats",
+            records=[(u, open_reviews[u], n) for u, n in assigned.items()],
+            columns=["user_id", "open_reviews", "assigned_reviews"],
+        )
+        await driver.execute("ANALYZE")
@@ -0,0 +1,171 @@
+import asyncio
+import itertools
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+
+import httpx
+
+from benchmarks.generator import Org
+
+
+@dataclass
+class Result:
+    latencies: list = field(default_factory=list)
+    statuses: Counter = field(default_factory=Counter)
+    elapsed: float = 0.0
+
+    def summary(self) -> dict:
+        lat = sorted(self.latencies)
+        n = len(lat)
+
+        def pct(p):
+            return round(lat[min(n - 1, int(p * n))] * 1000, 3) if n else None
+
+        return {
+            "requests": n,
+            "errors": sum(c for s, c in self.statuses.items() if s >= 500),
+            "statuses": {str(s): c for s, c in sorted(self.statuses.items())},
+            "rps": round(n / self.elapsed, 1) if self.elapsed else None,
+            "p50_ms": pct(0.50),
+            "p95_ms": pct(0.95),
+            "p99_ms": pct(0.99),
+            "max_ms": round(lat[-1] * 1000, 3) if n else None,
+            "mean_ms": round(sum(lat) / n * 1000, 3) if n else None,
+        }
+
+
+class Workload:
+    """Генерирует запросы сценариев по состоянию синтетической организации.
+
+    Ответы на запись обновляют локальное состояние (ревьюеры открытых PR),
+    чтобы reassign и merge били по существующим назначениям.
+    """
+
+    def __init__(self, org: Org, seed: int = 0):
+        self.rng = random.Random(seed)
+        self.org = org
+        self.team_names = [t[0] for t in org.teams]
+        self.members = {t: org.members(t) for t in self.team_names}
+        self.user_ids = [u[0] for u in org.users]
+        self.open_prs = org.open_prs()
+        self.open_ids = list(self.open_prs)
+        self.rng.shuffle(self.open_ids)
+        self.counter = itertools.count()
+        self.deactivate_queue = list(self.team_names)
+        self.rng.shuffle(self.deactivate_queue)
+
+    def create(self):
+        team = self.rng.choice(self.team_names)
+        return (
+            "POST",
+            "/pullRequest/create",
+            {
+                "pull_request_id": f"bench-{next(self.counter)}-{time.time_ns()}",
+                "pull_request_name": "bench",
+                "author_id": self.rng.choice(self.members[team]),
+            },
+        )
+
+    def reassign(self):
+        pr_id = self.rng.choice(self.open_ids)
+        reviewers = self.open_prs.get(pr_id) or ["nobody"]
+        return (
+            "POST",
+            "/pullRequest/reassign",
+            {
+                "pull_request_id": pr_id,
+                "old_user_id": self.rng.choice(reviewers),
+            },
+        )
+
+    def merge(self):
+        pr_id = self.open_ids.pop() if self.open_ids else "bpr-0"
+        return ("POST", "/pullRequest/merge", {"pull_request_id": pr_id})
+
+    def get_review(self):
+        user_id = self.rng.choice(self.user_ids)
+        return ("GET", f"/users/getReview?user_id={user_id}", None)
+
+    def get_team(self):
+        team = self.rng.choice(self.team_names)
+        return ("GET", f"/team/get?team_name={team}", None)
+
+    def stats(self):
+        return ("GET", "/stats", None)
+
+    def deactivate(self):
+        team = self.deactivate_queue.pop() if self.deactivate_queue else "-"
+        return ("POST", f"/team/team/deactivate?team_name={team}", None)
+
+    def observe(self, path: str, response: httpx.Response):
+        if response.status_code >= 300:
+            return
+        if path == "/pullRequest/reassign":
+            pr = response.json()["pr"]
+            self.open_prs[pr["pull_request_id"]] = pr["assigned_reviewers"]
+        elif path == "/pullRequest/create":
+            pr = response.json()
+            self.open_prs[pr["pull_request_id"]] = pr["assigned_reviewers"]
+            self.open_ids.append(pr["pull_request_id"])
+
+
+# порядок важен: чтение до записи, разрушающие сценарии в конце
+SCENARIOS = [
+    "get_review",
+    "get_team",
+    "stats",
+    "create",
+    "reassign",
+    "merge",
+    "deactivate",
+]
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    scenario: str,
+    requests: int,
+    concurrency: int,
+) -> Result:
+    make = getattr(workload, scenario)
+    result = Result()
+    remaining = itertools.count()
+
+    async def worker():
+        while next(remaining) < requests:
+            method, url, payload = make()
+            started = time.perf_counter()
+            response = await client.request(method, url, json=payload)
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[response.status_code] += 1
+            workload.observe(url, response)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.elapsed = time.perf_counter() - started
+    return result
+
+
+async def run(
+    client: httpx.AsyncClient,
+    workload: Workload,
+    scenarios: list,
+    requests: int,
+    concurrency: int,
+    deactivate_requests: int,
+) -> dict:
+    results = {}
+    for scenario in scenarios:
+        n = deactivate_requests if scenario == "deactivate" else requests
+        # прогревочный запрос не попадает в статистику
+        method, url, payload = getattr(workload, scenario)()
+        if scenario != "deactivate":
+            await client.request(method, url, json=payload)
+        result = await run_scenario(
+            client, workload, scenario, n, concurrency
+        )
+        results[scenario] = result.summary()
+    return results
@@ -0,0 +1,160 @@
+"""Микробенчмарк сериализации ответов /pullRequest/create и /users/getReview.
+
+    python -m benchmarks.serialization [--iterations 20000] [--rows 100]
+
+Сравнивает CPU на один ответ: прежний путь (pydantic-модель, повторная
+валидация через response_model, json.dumps) и быстрый (готовый dict,
+orjson, без response_model). База не нужна — меряется только сборка
+и сериализация ответа.
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import models, schemas
+from app.responses import dumps, prevalidated
+from app.routers.pull_requests import pr_response
+
+PRRow = namedtuple(
+    "PRRow",
+    "pull_request_id pull_request_name author_id status created_at merged_at",
+)
+
+CREATE_FIELD = create_response_field("Response_create", schemas.PullRequest)
+
+
+def make_pr(i: int = 0) -> PRRow:
+    return PRRow(
+        f"pr-{i:06d}",
+        f"Refactor module {i}",
+        f"u-{i % 50}",
+        models.PRStatus.OPEN,
+        datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i),
+        None,
+    )
+
+
+async def create_before(pr, assigned):
+    content = schemas.PullRequest(
+        pull_request_id=pr.pull_request_id,
+        pull_request_name=pr.pull_request_name,
+        author_id=pr.author_id,
+        status=pr.status.value if hasattr(pr.status, "value") else pr.status,
+        assigned_reviewers=assigned,
+        createdAt=pr.created_at.isoformat() if pr.created_at else None,
+        mergedAt=pr.merged_at.isoformat() if pr.merged_at else None,
+    )
+    content = await serialize_response(
+        field=CREATE_FIELD, response_content=content
+    )
+    return JSONResponse(content, status_code=201).body
+
+
+async def create_after(pr, assigned):
+    return prevalidated(pr_response(pr, assigned), status_code=201).body
+
+
+def reviews_before(user_id, rows):
+    chunks = [b'{"user_id":%s,"pull_requests":[' % json.dumps(user_id).encode()]
+    for n, row in enumerate(rows):
+        item = schemas.PullRequestShort(
+            pull_request_id=row.pull_request_id,
+            pull_request_name=row.pull_request_name,
+            author_id=row.author_id,
+            status=row.status,
+        )
+        chunks.append((b"," if n else b"") + item.model_dump_json().encode())
+    chunks.append(b'],"next_cursor":%s}' % json.dumps(None).encode())
+    return b"".join(chunks)
+
+
+def reviews_after(user_id, rows):
+    chunks = [b'{"user_id":%s,"pull_requests":[' % dumps(user_id)]
+    for n, row in enumerate(rows):
+        item = dumps(
+            {
+                "pull_request_id": row.pull_request_id,
+                "pull_request_name": row.pull_request_name,
+                "author_id": row.author_id,
+                "status": row.status.value,
+            }
+        )
+        chunks.append((b"," if n else b"") + item)
+    chunks.append(b'],"next_cursor":%s}' % dumps(None))
+    return b"".join(chunks)
+
+
+def cpu_per_call(fn, iterations: int) -> float:
+    started = time.process_time()
+    for _ in range(iterations):
+        fn()
+    return (time.process_time() - started) / iterations
+
+
+def run(iterations: int, rows: int) -> dict:
+    loop = asyncio.new_event_loop()
+    pr = make_pr()
+    assigned = ["u-1", "u-2"]
+    history = [make_pr(i) for i in range(rows)]
+
+    # оба пути должны давать одинаковый JSON
+    assert json.loads(
+        loop.run_until_complete(create_before(pr, assigned))
+    ) == json.loads(loop.run_until_complete(create_after(pr, assigned)))
+    assert json.loads(reviews_before("u-1", history)) == json.loads(
+        reviews_after("u-1", history)
+    )
+
+    # оба create-пути идут через event loop, так что его накладные
+    # расходы (~десятки мкс) есть с обеих сторон и экономию не завышают
+    cases = {
+        "create": (
+            lambda: loop.run_until_complete(create_before(pr, assigned)),
+            lambda: loop.run_until_complete(create_after(pr, assigned)),
+            iterations,
+        ),
+        f"getReview[{rows} rows]": (
+            lambda: reviews_before("u-1", history),
+            lambda: reviews_after("u-1", history),
+            max(1, iterations // rows),
+        ),
+    }
+    results = {}
+    for name, (before, after, n) in cases.items():
+        before(), after()
+        b = cpu_per_call(before, n)
+        a = cpu_per_call(after, n)
+        results[name] = {
+            "before_us": round(b * 1e6, 2),
+            "after_us": round(a * 1e6, 2),
+            "saved_us": round((b - a) * 1e6, 2),
+            "speedup": round(b / a, 2) if a else None,
+        }
+    loop.close()
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.serialization")
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--rows", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    results = run(args.iterations, args.rows)
+    for name, r in results.items():
+        print(
+            f"{name:<20} before {r['before_us']:>9} us  "
+            f"after {r['after_us']:>9} us  "
+            f"saved {r['saved_us']:>9} us  x{r['speedup']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
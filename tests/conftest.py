@@ -5,13 +5,18 @@ import pytest
 import pytest_asyncio
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
 from sqlalchemy import create_engine
 from fastapi.testclient import TestClient
 from httpx import AsyncClient
 
-from app.main import app
-from app.database import get_db
-from app.models import Base
+# прогрев при старте ходит в боевую БД из DATABASE_URL
+os.environ.setdefault("DB_WARMUP", "0")
+
+from app.main import app  # noqa: E402
+from app.database import get_db, get_session_factory  # noqa: E402
+from app.models import Base  # noqa: E402
+from app.repository import memory_backend  # noqa: E402
 
 
 @pytest.fixture(scope="session", autouse=True)
@@ -38,10 +43,31 @@ async def override_get_db():
 
 
 app.dependency_overrides[get_db] = override_get_db
+app.dependency_overrides[get_session_factory] = lambda: AsyncSessionLocal
+
+
+# REPOSITORY_BACKEND=memory: тесты идут без БД, кроме помеченных postgres
+# и использующих db_session
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "postgres: test needs the Postgres backend"
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    if not memory_backend():
+        return
+    skip = pytest.mark.skip(reason="needs REPOSITORY_BACKEND=postgres")
+    for item in items:
+        if "postgres" in item.keywords or "db_session" in item.fixturenames:
+            item.add_marker(skip)
 
 
 @pytest.fixture(scope="session", autouse=True)
 def setup_database():
+    if memory_backend():
+        yield
+        return
     sync_engine = create_engine(TEST_DB_URL.replace("+asyncpg", ""))
     Base.metadata.create_all(bind=sync_engine)
     yield
@@ -66,6 +92,24 @@ async def async_client():
             yield session
 
     app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_session_factory] = (
+        lambda: async_session_factory
+    )
+
+    if memory_backend():
+        from app.memory_repository import memory_repository
+
+        memory_repository.clear()
 
     async with AsyncClient(app=app, base_url="http://testserver") as ac:
         yield ac
+
+
+# Прямой доступ к тестовой БД для проверок; NullPool — у каждого теста
+# свой event loop, соединения между ними переиспользовать нельзя.
+@pytest_asyncio.fixture
+async def db_session():
+    engine = create_async_engine(TEST_DB_URL, poolclass=NullPool)
+    async with AsyncSession(engine) as session:
+        yield session
+    await engine.dispose()
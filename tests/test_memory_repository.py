@@ -0,0 +1,207 @@
+import json
+import random
+from collections import Counter
+from uuid import uuid4
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app import config, models
+from app.main import app
+from app.memory_repository import MemoryRepository, memory_repository
+from app.repository import Repository
+
+
+@pytest_asyncio.fixture
+async def memory_client(monkeypatch):
+    monkeypatch.setattr(config, "REPOSITORY_BACKEND", "memory")
+    memory_repository.clear()
+    async with AsyncClient(app=app, base_url="http://testserver") as client:
+        yield client
+    memory_repository.clear()
+
+
+async def scenario(client: AsyncClient, prefix: str) -> list:
+    """Детерминированный сценарий: у каждого выбора ровно столько
+    кандидатов, сколько нужно ревьюеров."""
+    a, b, c, d = (f"{prefix}-{u}" for u in "abcd")
+    pr1, pr2 = f"{prefix}-1", f"{prefix}-2"
+
+    def pr(pr_id, author_id, name="PR"):
+        return {
+            "pull_request_id": pr_id,
+            "pull_request_name": name,
+            "author_id": author_id,
+        }
+
+    def reassign(old_user_id):
+        return {"pull_request_id": pr1, "old_user_id": old_user_id}
+
+    team = {
+        "team_name": prefix,
+        "members": [
+            {"user_id": u, "username": u, "is_active": u != d}
+            for u in (a, b, c, d)
+        ],
+    }
+    bulk = [pr(pr2, a), pr(pr1, a), pr(f"{prefix}-3", f"{prefix}-x")]
+    bulk.append({"pull_request_id": f"{prefix}-4", "author_id": a})
+    calls = [
+        ("POST", "/team/add", team),
+        ("POST", "/pullRequest/create", pr(pr1, a)),
+        ("POST", "/users/setIsActive", {"user_id": d, "is_active": True}),
+        ("POST", "/pullRequest/reassign", reassign(b)),
+        ("POST", "/pullRequest/reassign", reassign(b)),
+        ("POST", "/pullRequest/merge", {"pull_request_id": pr1}),
+        ("POST", "/pullRequest/merge", {"pull_request_id": pr1}),
+        ("POST", "/pullRequest/reassign", reassign(c)),
+        ("POST", "/users/setIsActive", {"user_id": d, "is_active": False}),
+        ("POST", "/pullRequest/bulkCreate", {"pull_requests": bulk}),
+        (
+            "POST",
+            "/pullRequest/bulkMerge",
+            {"pull_request_ids": [pr1, f"{prefix}-9"]},
+        ),
+        ("POST", f"/team/team/deactivate?team_name={prefix}", None),
+        ("GET", f"/users/getReview?user_id={c}", None),
+        ("GET", f"/users/getReview?user_id={b}", None),
+        ("GET", f"/team/get?team_name={prefix}", None),
+        ("GET", f"/team/get?team_name={prefix}-missing", None),
+        ("POST", f"/team/rebalance?team_name={prefix}&dry_run=true", None),
+    ]
+    responses = []
+    for method, url, payload in calls:
+        response = await client.request(method, url, json=payload)
+        responses.append((response.status_code, normalize(response.json())))
+    return json.loads(json.dumps(responses).replace(prefix, "P"))
+
+
+SORTED_LISTS = ("assigned_reviewers", "deactivated_users")
+
+
+def normalize(body):
+    if isinstance(body, dict):
+        # порядок ревьюеров и участников у хранилищ может различаться
+        return {
+            key: sorted(value)
+            if key in SORTED_LISTS and all(isinstance(v, str) for v in value)
+            else normalize(value)
+            for key, value in body.items()
+            if key not in ("createdAt", "mergedAt")
+        }
+    if isinstance(body, list):
+        items = [normalize(item) for item in body]
+        if all(isinstance(item, dict) and "user_id" in item for item in items):
+            return sorted(items, key=lambda item: item["user_id"])
+        return items
+    return body
+
+
+@pytest.mark.postgres
+@pytest.mark.asyncio
+async def test_backends_agree(async_client: AsyncClient, monkeypatch):
+    prefix = f"par-{uuid4().hex[:8]}"
+    expected = await scenario(async_client, prefix)
+
+    monkeypatch.setattr(config, "REPOSITORY_BACKEND", "memory")
+    memory_repository.clear()
+    try:
+        assert await scenario(async_client, prefix) == expected
+    finally:
+        memory_repository.clear()
+
+    statuses = [status for status, _ in expected]
+    assert statuses == [
+        201, 201, 200, 200, 409, 200, 200, 409, 200, 200, 200, 200, 200,
+        200, 200, 404, 200,
+    ]
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_api(memory_client: AsyncClient):
+    responses = await scenario(memory_client, "mem")
+    assert [status for status, _ in responses][:3] == [201, 201, 200]
+    # P-d — единственный свободный кандидат на замену P-b
+    assert responses[3][1]["replaced_by"] == "P-d"
+    deactivated = responses[11][1]
+    assert deactivated["affected_pull_requests"] == 1
+    assert deactivated["reassigned_pull_requests"] == 0
+
+    response = await memory_client.get("/stats?limit=10")
+    assert response.json() == {
+        "users": {"mem-a": 0, "mem-b": 0, "mem-c": 1, "mem-d": 1},
+        "pull_requests": {"mem-1": 2, "mem-2": 0},
+    }
+    response = await memory_client.get("/stats?top=2")
+    assert response.json()["users"] == {"mem-d": 1, "mem-c": 1}
+
+    # возможности только Postgres-хранилища
+    for method, url in (
+        ("GET", "/jobs/any"),
+        ("GET", "/export/pullRequests"),
+        ("GET", "/stats/reviews"),
+        ("POST", "/team/team/deactivate?team_name=mem&async=true"),
+    ):
+        response = await memory_client.request(method, url)
+        assert response.status_code == 501
+        assert response.json()["detail"]["error"]["code"] == "NOT_SUPPORTED"
+
+
+@pytest.mark.asyncio
+async def test_memory_repository_invariants(monkeypatch):
+    monkeypatch.setattr(config, "REVIEWER_STRATEGY", "least_loaded")
+    repo = MemoryRepository()
+    rng = random.Random(7)
+    teams = {f"t{t}": [f"t{t}-u{i}" for i in range(8)] for t in range(4)}
+    for team_name, users in teams.items():
+        await repo.upsert_team(
+            team_name,
+            [{"user_id": u, "username": u, "is_active": True} for u in users],
+        )
+    everyone = [u for users in teams.values() for u in users]
+
+    for n in range(2000):
+        op = rng.random()
+        pr_id = f"pr-{rng.randrange(max(n, 1))}"
+        if op < 0.5:
+            await repo.create_pr(f"pr-{n}", "x", rng.choice(everyone))
+        elif op < 0.7:
+            pr = repo.prs.get(pr_id)
+            if pr is not None and pr.reviewers:
+                await repo.reassign_reviewer(pr_id, rng.choice(pr.reviewers))
+        elif op < 0.85:
+            await repo.merge_pr(pr_id)
+        elif op < 0.99:
+            await repo.set_user_active(rng.choice(everyone), rng.random() < 0.7)
+        else:
+            await repo.deactivate_team(rng.choice(list(teams)), chunk_size=7)
+
+    open_reviews = Counter()
+    assigned = Counter()
+    for pr in repo.prs.values():
+        assert len(set(pr.reviewers)) == len(pr.reviewers) <= 2
+        assert pr.author_id not in pr.reviewers
+        assigned.update(pr.reviewers)
+        if pr.status == models.PRStatus.OPEN:
+            open_reviews.update(pr.reviewers)
+        for user_id in pr.reviewers:
+            assert pr.pull_request_id in repo.reviews[user_id]
+    assert +repo.open_reviews == open_reviews
+    assert +repo.assigned_reviews == assigned
+    for team_name, users in teams.items():
+        active = {u for u in users if repo.users[u].is_active}
+        assert repo.active[team_name] == active
+
+
+def test_repository_requires_all_methods():
+    required = Repository.__abstractmethods__
+    assert "rebalance_team" in required and "enqueue_job" not in required
+    # хранилище без одного метода не создаётся, а не падает при вызове
+    partial = type(
+        "Partial",
+        (Repository,),
+        {name: lambda self: None for name in required - {"rebalance_team"}},
+    )
+    with pytest.raises(TypeError, match="rebalance_team"):
+        partial()
@@ -0,0 +1,212 @@
+from uuid import uuid4
+
+import pytest
+from httpx import AsyncClient
+
+from app import query_audit
+from app.roster_cache import roster_cache
+
+pytestmark = pytest.mark.postgres
+
+# Сколько SQL-statements может выполнить маршрут (с холодным кэшем
+# составов). Рост числа — регрессия: лишний round-trip или N+1.
+# Записи, меняющие назначения, добавляют один pg_notify перед коммитом
+# (события /users/{user_id}/events).
+BUDGETS = {
+    "add_team": 2,
+    "get_team": 2,
+    "set_is_active": 2,
+    "get_review": 1,
+    "create_pr": 7,
+    "bulk_create": 7,
+    "merge_pr": 2,
+    "merge_pr_again": 2,
+    "bulk_merge": 3,
+    "reassign": 7,
+    "stats": 2,
+    "deactivate_team": 9,
+    "rebalance": 7,
+}
+
+
+async def add_team(client: AsyncClient, size: int = 6):
+    prefix = uuid4().hex[:8]
+    team_name = f"qb-{prefix}"
+    members = [f"qb-{prefix}-{i}" for i in range(size)]
+    response = await client.post(
+        "/team/add",
+        json={
+            "team_name": team_name,
+            "members": [
+                {"user_id": u, "username": u, "is_active": True}
+                for u in members
+            ],
+        },
+    )
+    assert response.status_code == 201
+    return team_name, members
+
+
+async def create_pr(client: AsyncClient, author_id: str):
+    pr_id = f"qb-pr-{uuid4().hex[:12]}"
+    response = await client.post(
+        "/pullRequest/create",
+        json={
+            "pull_request_id": pr_id,
+            "pull_request_name": "budget",
+            "author_id": author_id,
+        },
+    )
+    assert response.status_code == 201
+    return response.json()
+
+
+# Каждый сценарий готовит данные и возвращает измеряемый запрос.
+async def scenario_add_team(client):
+    prefix = uuid4().hex[:8]
+    return "POST", "/team/add", {
+        "team_name": f"qb-{prefix}",
+        "members": [
+            {"user_id": f"qb-{prefix}-{i}", "username": "x", "is_active": True}
+            for i in range(20)
+        ],
+    }
+
+
+async def scenario_get_team(client):
+    team_name, _ = await add_team(client, size=20)
+    return "GET", f"/team/get?team_name={team_name}", None
+
+
+async def scenario_set_is_active(client):
+    _, members = await add_team(client)
+    return "POST", "/users/setIsActive", {
+        "user_id": members[0],
+        "is_active": False,
+    }
+
+
+async def scenario_get_review(client):
+    _, members = await add_team(client, size=3)
+    for _ in range(5):
+        await create_pr(client, members[0])
+    return "GET", f"/users/getReview?user_id={members[1]}", None
+
+
+async def scenario_create_pr(client):
+    _, members = await add_team(client)
+    return "POST", "/pullRequest/create", {
+        "pull_request_id": f"qb-pr-{uuid4().hex[:12]}",
+        "pull_request_name": "budget",
+        "author_id": members[0],
+    }
+
+
+async def scenario_bulk_create(client):
+    _, members = await add_team(client)
+    _, others = await add_team(client)
+    return "POST", "/pullRequest/bulkCreate", {
+        "pull_requests": [
+            {
+                "pull_request_id": f"qb-pr-{uuid4().hex[:12]}",
+                "pull_request_name": "budget",
+                "author_id": author_id,
+            }
+            for author_id in members + others
+        ]
+    }
+
+
+async def scenario_merge_pr(client):
+    _, members = await add_team(client)
+    pr = await create_pr(client, members[0])
+    return "POST", "/pullRequest/merge", {
+        "pull_request_id": pr["pull_request_id"]
+    }
+
+
+async def scenario_merge_pr_again(client):
+    method, url, payload = await scenario_merge_pr(client)
+    await client.post(url, json=payload)
+    return method, url, payload
+
+
+async def scenario_bulk_merge(client):
+    _, members = await add_team(client)
+    prs = [await create_pr(client, author_id) for author_id in members]
+    merged = prs[0]["pull_request_id"]
+    await client.post("/pullRequest/merge", json={"pull_request_id": merged})
+    return "POST", "/pullRequest/bulkMerge", {
+        "pull_request_ids": [pr["pull_request_id"] for pr in prs]
+        + [f"qb-pr-{uuid4().hex[:12]}"]
+    }
+
+
+async def scenario_reassign(client):
+    _, members = await add_team(client)
+    pr = await create_pr(client, members[0])
+    return "POST", "/pullRequest/reassign", {
+        "pull_request_id": pr["pull_request_id"],
+        "old_user_id": pr["assigned_reviewers"][0],
+    }
+
+
+async def scenario_stats(client):
+    return "GET", "/stats?limit=50", None
+
+
+async def scenario_deactivate_team(client):
+    team_name, members = await add_team(client)
+    _, others = await add_team(client)
+    for author_id in others:
+        await create_pr(client, author_id)
+    for author_id in members:
+        await create_pr(client, author_id)
+    return "POST", f"/team/team/deactivate?team_name={team_name}", None
+
+
+async def scenario_rebalance(client):
+    team_name, members = await add_team(client)
+    # последний участник неактивен при создании PR, а при
+    # перераспределении забирает часть ревью остальных
+    newcomer = {"user_id": members[-1], "is_active": False}
+    await client.post("/users/setIsActive", json=newcomer)
+    for _ in range(3):
+        for author_id in members[:-1]:
+            await create_pr(client, author_id)
+    await client.post("/users/setIsActive", json={**newcomer, "is_active": True})
+    return "POST", f"/team/rebalance?team_name={team_name}", None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("route", sorted(BUDGETS))
+async def test_route_query_budget(async_client: AsyncClient, route):
+    method, url, payload = await globals()[f"scenario_{route}"](async_client)
+    roster_cache.clear()
+
+    with query_audit.capture() as audit:
+        response = await async_client.request(method, url, json=payload)
+
+    assert response.status_code < 300, response.text
+    assert audit.count <= BUDGETS[route], audit.report()
+    assert not audit.repeated(), audit.report()
+
+
+@pytest.mark.asyncio
+async def test_repeated_statements_are_flagged(async_client: AsyncClient):
+    _, members = await add_team(async_client, size=3)
+
+    with query_audit.capture() as audit:
+        for user_id in members:
+            await async_client.post(
+                "/users/setIsActive",
+                json={"user_id": user_id, "is_active": False},
+            )
+
+    repeated = audit.repeated(threshold=3)
+    assert len(repeated) == 2
+    assert all(n == 3 for n in repeated.values())
+    # значения параметров не влияют на форму statement
+    assert query_audit.shape("SELECT 1 WHERE x IN ($1, $2, $3)") == (
+        query_audit.shape("SELECT 2 WHERE x IN ($1)")
+    )
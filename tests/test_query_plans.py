@@ -0,0 +1,255 @@
+import json
+
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.database import get_db, get_session_factory
+from app.main import app
+from app.models import Base
+from app.roster_cache import roster_cache
+from tests.conftest import TEST_DB_URL
+
+pytestmark = pytest.mark.postgres
+
+# Отдельная схема с «историей», чтобы планировщик выбирал планы как на
+# большой базе, а данные не смешивались с остальными тестами.
+SCHEMA = "plan_check"
+TEAMS = 800
+USERS_PER_TEAM = 25
+USERS = TEAMS * USERS_PER_TEAM
+PRS = 50_000
+OPEN_EVERY = 50
+
+# reviewer_stats — узкая строка на пользователя: выборка сотен кандидатов
+# из неё законно может идти Seq Scan, и растёт она с оргструктурой, а не
+# с историей PR
+LARGE_TABLES = {"users", "pull_requests", "pr_reviewers"}
+
+
+def seed(conn):
+    conn.execute(
+        text(
+            """
+            INSERT INTO teams (team_name)
+            SELECT 'pc-t-' || t FROM generate_series(0, :teams - 1) t
+            """
+        ),
+        {"teams": TEAMS},
+    )
+    conn.execute(
+        text(
+            """
+            INSERT INTO users (user_id, username, team_name, is_active)
+            SELECT 'pc-u-' || u, 'user ' || u, 'pc-t-' || (u / :per_team),
+                   u % 10 <> 9
+            FROM generate_series(0, :users - 1) u
+            """
+        ),
+        {"users": USERS, "per_team": USERS_PER_TEAM},
+    )
+    conn.execute(
+        text(
+            """
+            INSERT INTO pull_requests (
+                pull_request_id, pull_request_name, author_id, status,
+                created_at, merged_at
+            )
+            SELECT 'pc-pr-' || p, 'PR ' || p, 'pc-u-' || (p % :users),
+                   CASE WHEN p % :open_every = 0
+                        THEN 'OPEN' ELSE 'MERGED' END::prstatus,
+                   now() - make_interval(mins => :prs - p),
+                   CASE WHEN p % :open_every = 0 THEN NULL
+                        ELSE now() - make_interval(mins => :prs - p - 30) END
+            FROM generate_series(0, :prs - 1) p
+            """
+        ),
+        {"users": USERS, "prs": PRS, "open_every": OPEN_EVERY},
+    )
+    # два ревьюера из команды автора, не совпадающие с автором
+    conn.execute(
+        text(
+            """
+            INSERT INTO pr_reviewers (pr_id, user_id)
+            SELECT 'pc-pr-' || p,
+                   'pc-u-' || (
+                       (p % :users) / :per_team * :per_team
+                       + ((p % :users) % :per_team + k) % :per_team
+                   )
+            FROM generate_series(0, :prs - 1) p, generate_series(1, 2) k
+            """
+        ),
+        {"users": USERS, "prs": PRS, "per_team": USERS_PER_TEAM},
+    )
+    conn.execute(text("UPDATE pull_requests SET reviewers_count = 2"))
+    conn.execute(
+        text(
+            """
+            INSERT INTO reviewer_stats (user_id, open_reviews, assigned_reviews)
+            SELECT r.user_id, count(*) FILTER (WHERE p.status = 'OPEN'),
+                   count(*)
+            FROM pr_reviewers r
+            JOIN pull_requests p ON p.pull_request_id = r.pr_id
+            GROUP BY r.user_id
+            """
+        )
+    )
+
+
+@pytest.fixture(scope="module")
+def plan_schema():
+    sync_engine = create_engine(TEST_DB_URL.replace("+asyncpg", ""))
+    with sync_engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+        conn.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        Base.metadata.create_all(bind=conn)
+        seed(conn)
+    with sync_engine.connect() as conn:
+        conn.execution_options(isolation_level="AUTOCOMMIT")
+        conn.execute(text(f"SET search_path TO {SCHEMA}"))
+        conn.execute(text("ANALYZE"))
+    roster_cache.clear()
+    yield
+    roster_cache.clear()
+    with sync_engine.begin() as conn:
+        conn.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+    sync_engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def plan_client(plan_schema):
+    engine = create_async_engine(
+        TEST_DB_URL,
+        connect_args={"server_settings": {"search_path": SCHEMA}},
+    )
+    session_factory = sessionmaker(
+        engine, class_=AsyncSession, expire_on_commit=False
+    )
+    captured = []
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if not executemany and verb in ("SELECT", "UPDATE", "DELETE", "WITH"):
+            captured.append((statement, parameters))
+
+    async def get_plan_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_db] = get_plan_db
+    app.dependency_overrides[get_session_factory] = lambda: session_factory
+    roster_cache.clear()
+
+    async with AsyncClient(app=app, base_url="http://testserver") as client:
+        yield client, captured, engine
+
+    await engine.dispose()
+
+
+def seq_scans(plan):
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(seq_scans(child))
+    return found
+
+
+async def explain_all(engine, captured):
+    scans = []
+    async with engine.connect() as conn:
+        raw = await conn.get_raw_connection()
+        driver = raw.driver_connection
+        for statement, parameters in captured:
+            result = await driver.fetchval(
+                "EXPLAIN (FORMAT JSON) " + statement, *(parameters or ())
+            )
+            # диалект SQLAlchemy регистрирует json-кодек на соединении
+            if isinstance(result, str):
+                result = json.loads(result)
+            plan = result[0]["Plan"]
+            scans.extend(
+                (table, statement)
+                for table in seq_scans(plan)
+                if table in LARGE_TABLES
+            )
+    return scans
+
+
+SCENARIOS = {
+    "create_pr": (
+        "POST",
+        "/pullRequest/create",
+        {
+            "pull_request_id": "pc-new-1",
+            "pull_request_name": "Plan check",
+            "author_id": "pc-u-100",
+        },
+    ),
+    "bulk_create": (
+        "POST",
+        "/pullRequest/bulkCreate",
+        {
+            "pull_requests": [
+                {
+                    "pull_request_id": f"pc-bulk-{i}",
+                    "pull_request_name": "Plan check",
+                    "author_id": f"pc-u-{i * 37}",
+                }
+                for i in range(20)
+            ]
+        },
+    ),
+    "merge_pr": ("POST", "/pullRequest/merge", {"pull_request_id": "pc-pr-50"}),
+    "reassign": (
+        "POST",
+        "/pullRequest/reassign",
+        {"pull_request_id": "pc-pr-100", "old_user_id": "pc-u-101"},
+    ),
+    "get_review": ("GET", "/users/getReview?user_id=pc-u-4321", None),
+    "get_review_open": (
+        "GET",
+        "/users/getReview?user_id=pc-u-4321&status=OPEN&limit=10",
+        None,
+    ),
+    "get_team": ("GET", "/team/get?team_name=pc-t-17", None),
+    "add_team": (
+        "POST",
+        "/team/add",
+        {
+            "team_name": "pc-t-18",
+            "members": [
+                {"user_id": f"pc-u-{450 + i}", "username": "x", "is_active": True}
+                for i in range(30)
+            ],
+        },
+    ),
+    "set_is_active": (
+        "POST",
+        "/users/setIsActive",
+        {"user_id": "pc-u-555", "is_active": False},
+    ),
+    "stats": ("GET", "/stats?limit=100&offset=2000", None),
+    "stats_top": ("GET", "/stats?top=20", None),
+    "deactivate_team": ("POST", "/team/team/deactivate?team_name=pc-t-42", None),
+    "rebalance": ("POST", "/team/rebalance?team_name=pc-t-43", None),
+}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("scenario", sorted(SCENARIOS))
+async def test_no_seq_scan_on_large_tables(plan_client, scenario):
+    client, captured, engine = plan_client
+    method, url, payload = SCENARIOS[scenario]
+
+    response = await client.request(method, url, json=payload)
+    assert response.status_code < 300, response.text
+    assert captured, "route did not touch the database"
+
+    scans = await explain_all(engine, captured)
+    assert not scans, "\n\n".join(f"{t}: {s}" for t, s in scans)
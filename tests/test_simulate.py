@@ -0,0 +1,160 @@
+import json
+
+import numpy as np
+import orjson
+
+from app import simulate
+
+
+def test_gini_and_max_mean():
+    assert simulate.gini(np.array([5, 5, 5, 5])) == 0
+    assert simulate.gini(np.zeros(3)) == 0
+    # всё у одного из n: (n - 1) / n
+    assert np.isclose(simulate.gini(np.array([0, 0, 0, 8])), 0.75)
+    assert np.isclose(simulate.gini(np.array([1, 2, 3, 4])), 0.25)
+    matrix = np.array([[1, 0], [1, 0], [1, 6]])
+    assert np.allclose(simulate.gini(matrix, axis=0), [0, 2 / 3])
+    assert np.allclose(simulate.max_mean(matrix, axis=0), [1, 3])
+
+
+def test_queue_lengths():
+    grid = np.array([0.0, 10.0, 20.0, 30.0])
+    user = np.array([0, 0, 1, 1])
+    start = np.array([0.0, 5.0, 10.0, 25.0])
+    end = np.array([20.0, 30.0, 11.0, 40.0])
+    queue = simulate.queue_lengths(user, start, end, grid, users=3)
+    assert queue.tolist() == [[1, 2, 1, 0], [0, 1, 0, 1], [0, 0, 0, 0]]
+
+
+def history(**columns):
+    defaults = {
+        "user_ids": ["a", "b", "c", "d"],
+        "team_of": np.array([0, 0, 0, 1]),
+        "active": np.array([True, True, True, True]),
+    }
+    return simulate.History(**{**defaults, **columns})
+
+
+def test_simulate_follows_assignment_rules():
+    run = simulate.simulate(
+        history(
+            author=np.array([0, 0, 3]),
+            created=np.array([0.0, 1.0, 2.0]),
+            merged=np.array([5.0, np.nan, 3.0]),
+            reassign_at=np.array([np.nan, 4.0, np.nan]),
+        ),
+        "least_loaded",
+        samples=6,
+    )
+    # кандидаты автора a — b и c; у d в команде нет никого
+    assert run.assignments.tolist() == [0, 2, 2, 0]
+    assert run.unassigned == 1
+    # замене из команды прежнего ревьюера некого предложить
+    assert run.reassigns == 0
+    # сетка до последнего события; открытый PR остаётся в очереди
+    assert run.samples.tolist() == [0, 1, 2, 3, 4, 5]
+    assert run.queue.tolist() == [
+        [0] * 6,
+        [1, 2, 2, 2, 2, 1],
+        [1, 2, 2, 2, 2, 1],
+        [0] * 6,
+    ]
+
+
+def test_simulate_reassign_moves_queue():
+    run = simulate.simulate(
+        history(
+            user_ids=["a", "b", "c", "d", "e"],
+            team_of=np.array([0, 0, 0, 0, 1]),
+            active=np.array([True, True, True, True, True]),
+            author=np.array([0]),
+            created=np.array([0.0]),
+            merged=np.array([10.0]),
+            reassign_at=np.array([5.0]),
+        ),
+        "random",
+        samples=11,
+    )
+    assert run.reassigns == 1
+    assert run.assignments.sum() == 3
+    # на каждый момент до merge — ровно два ревьюера, замена без автора
+    assert run.queue.sum(axis=0).tolist() == [2] * 10 + [0]
+    assert run.queue[0].sum() == 0
+
+
+def test_least_loaded_is_fairer():
+    data = simulate.synthetic_history(
+        teams=5, users_per_team=8, prs=20000, days=30, seed=3
+    )
+    runs, reports = simulate.compare(data, ["random", "least_loaded"], 200)
+    by_name = {report["strategy"]: report for report in reports}
+    assert by_name["random"]["assignments"] == runs[0].assignments.sum()
+    assert (
+        by_name["least_loaded"]["queue_gini_over_time"]
+        < by_name["random"]["queue_gini_over_time"]
+    )
+    assert (
+        by_name["least_loaded"]["queue_peak"] <= by_name["random"]["queue_peak"]
+    )
+
+
+def test_replay_export(tmp_path):
+    rows = [
+        ("pr-1", "a", "2026-01-01T10:00:00+00:00", None, ["b", "c"]),
+        ("pr-2", "b", "2026-01-01T11:00:00+00:00", None, ["a"]),
+        ("pr-3", "x", "2026-01-01T12:00:00+00:00", None, []),
+        (
+            "pr-4",
+            "d",
+            "2026-01-01T09:00:00+00:00",
+            "2026-01-01T13:00:00+00:00",
+            ["e"],
+        ),
+    ]
+    path = tmp_path / "prs.ndjson"
+    path.write_bytes(
+        b"".join(
+            orjson.dumps(
+                {
+                    "pull_request_id": pr_id,
+                    "pull_request_name": pr_id,
+                    "author_id": author_id,
+                    "status": "MERGED" if merged_at else "OPEN",
+                    "created_at": created_at,
+                    "merged_at": merged_at,
+                    "reviewers": reviewers,
+                }
+            )
+            + b"\n"
+            for pr_id, author_id, created_at, merged_at, reviewers in rows
+        )
+    )
+
+    inferred = simulate.load_history(str(path))
+    teams = dict(zip(inferred.user_ids, inferred.team_of.tolist()))
+    assert teams["a"] == teams["b"] == teams["c"]
+    assert teams["d"] == teams["e"] != teams["a"]
+    assert len({teams["x"], teams["a"], teams["d"]}) == 3
+    assert inferred.created[3] - inferred.created[0] == -3600
+    assert np.isnan(inferred.merged[:3]).all()
+
+    teams_path = tmp_path / "teams.json"
+    teams_path.write_text(
+        json.dumps(
+            [
+                {
+                    "team_name": "core",
+                    "members": [
+                        {"user_id": u, "username": u, "is_active": u != "c"}
+                        for u in "abc"
+                    ],
+                }
+            ]
+        )
+    )
+    known = simulate.load_history(str(path), str(teams_path))
+    run = simulate.simulate(known, "least_loaded", samples=10)
+    assignments = dict(zip(known.user_ids, run.assignments.tolist()))
+    # c неактивен, x и d вне известных команд; ревьюеры выгрузки не нужны
+    assert assignments == {"a": 1, "b": 1, "c": 0, "x": 0, "d": 0}
+    assert run.unassigned == 4